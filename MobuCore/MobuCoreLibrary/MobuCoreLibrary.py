@@ -29,30 +29,298 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 '''
 
-from pyfbsdk import FBGroup, FBTangentConstantMode, FBCharacterPoseFlag, FBInterpolation, FBFilterManager, FBTangentMode, FBPropertyListComponent, FBFCurve, FBModelTransformationType, FBPropertyType, FBModel, FBMarkerLook, FBNamespaceAction, FBSystem, FBCharacterPose, FBFindObjectsByName, FBEffectorId, FBPlugModificationFlag, FBMesh, FBCharacterPoseOptions, FBConstraintManager, FBBeginChangeAllModels, FBCamera, FBTime, FBConnect, FBComponentList, FBModelMarker, FBVector3d, FBBodyNodeId, FBCharacterExtension, FBEndChangeAllModels, FBModelSkeleton, FBPlotOptions, FBMesh, FBApplication, FBModelNull, FBComponentList, FBTimeSpan, FBNamespace, FBPlayerControl
+from pyfbsdk import FBGroup, FBTangentConstantMode, FBCharacterPoseFlag, FBInterpolation, FBFilterManager, FBTangentMode, FBPropertyListComponent, FBFCurve, FBModelTransformationType, FBPropertyType, FBModel, FBMarkerLook, FBNamespaceAction, FBSystem, FBCharacterPose, FBFindObjectsByName, FBEffectorId, FBPlugModificationFlag, FBMesh, FBCharacterPoseOptions, FBConstraintManager, FBBeginChangeAllModels, FBCamera, FBTime, FBConnect, FBComponentList, FBModelMarker, FBVector3d, FBBodyNodeId, FBCharacterExtension, FBEndChangeAllModels, FBModelSkeleton, FBPlotOptions, FBMesh, FBApplication, FBModelNull, FBComponentList, FBTimeSpan, FBNamespace, FBPlayerControl, FBScene, FBSceneChangeType, FBProgress
 import os
 import json
 import math
+import itertools
+import bisect
+import time
+import fnmatch
 from datetime import datetime, timedelta
 
+# Timer for measuring how long things take. time.perf_counter doesn't exist on Python 2.7, so that falls back to time.time.
+perfCounter = getattr(time, "perf_counter", time.time)
+
 '''
-The following function is for getting all scene components while avoiding the RTTI error that you sometimes get with FBSystem().Scene.Components.
+The following functions are for getting all scene components while avoiding the RTTI error that you sometimes get with FBSystem().Scene.Components. If getting a component raises the error, that component is skipped.
+
+IterSceneComponents yields the components one at a time, so callers that only want some of the components, or only the first match, don't need a list of the whole scene. It can filter by type, selection, namespace and a custom predicate. Filters are checked in that order, and a component that raises an error in a filter is skipped.
 '''
 
-# Gets all scene components and adds them to a list.
-def GetSceneComponents():
-    sceneComponents = []
+# Yields scene components that pass the given filters. types and excludeTypes are a type or tuple of types, namespace is an exact namespace (with or without the trailing ":"), and predicate is a function that takes a component and returns True to keep it.
+def IterSceneComponents(types = None, excludeTypes = None, selectedOnly = False, namespace = None, predicate = None):
+    if namespace and namespace[-1] != ":":
+        namespace = namespace + ":"
     components = FBSystem().Scene.Components
     numberOfComponents = len(components)
-    count = 0
-    while count != numberOfComponents:
+    for i in range(numberOfComponents):
         try:
-            for i in range(count,numberOfComponents):
-                count += 1
-                sceneComponents.append(components[i])
+            obj = components[i]
+            if types and not isinstance(obj, types):
+                continue
+            if excludeTypes and isinstance(obj, excludeTypes):
+                continue
+            if selectedOnly and not obj.Selected:
+                continue
+            if namespace and GetNamespaceForObject(obj) != namespace:
+                continue
+            if predicate and not predicate(obj):
+                continue
         except:
-            pass    
-    return sceneComponents 
+            continue
+        yield obj
+
+# Gets all scene components and adds them to a list.
+def GetSceneComponents():
+    return list(IterSceneComponents())
+
+'''
+The following are for looking up scene components without going through every component in the scene each time. The index is built from GetSceneComponents the first time it's used, then kept up to date by the scene change callbacks as components are added, deleted and renamed. Starting a new file or opening a file throws the index away, and it's built again the next time it's used. FindByName, GetSelected and FindByNamespace use the index.
+
+Components are grouped by name, long name and namespace, and put in type buckets: "Mesh", "SceneObject" (the types that sceneObjectsOnly looks for), "Namespace" and "Other". Lookups return components in scene order.
+
+The index also tracks which components are selected, using the select and unselect scene change events, so GetSelected and DeselectAll only need to look at the selection. The tracked components are checked as they're returned, and if one of them isn't selected any more, or a select or unselect event came for a component the index couldn't find (so the tracked selection can't be trusted), the selection is rescanned from the index. DeselectAll also checks every scene component if the tracked selection is empty, in case a selection was missed.
+
+To note: If the callbacks can't be registered, the index is built again for every lookup, so lookups still work, they just aren't any faster.
+'''
+
+SCENE_OBJECT_TYPES = (FBModel, FBModelMarker, FBModelSkeleton, FBModelNull, FBCamera)
+SCENE_CHANGE_RENAME_TYPES = [FBSceneChangeType.kFBSceneChangeRename, FBSceneChangeType.kFBSceneChangeRenamePrefix, FBSceneChangeType.kFBSceneChangeRenameUnique, FBSceneChangeType.kFBSceneChangeRenameUniquePrefix]
+SCENE_CHANGE_RENAMED_TYPES = [FBSceneChangeType.kFBSceneChangeRenamed, FBSceneChangeType.kFBSceneChangeRenamedPrefix, FBSceneChangeType.kFBSceneChangeRenamedUnique, FBSceneChangeType.kFBSceneChangeRenamedUniquePrefix]
+
+class SceneComponentIndex(object):
+    def __init__(self):
+        self.callbacksRegistered = False
+        self.Clear()
+
+    # Throws the index away, so that it's built again the next time it's used.
+    def Clear(self):
+        self.built = False
+        self.nextEntryId = 0
+        self.entries = {}
+        self.byName = {}
+        self.byLongName = {}
+        self.byNamespace = {}
+        self.byType = {}
+        self.selected = {}
+        self.selectionConfirmed = False
+
+    # Gets the type bucket for a component.
+    def GetTypeBucket(self, obj):
+        if isinstance(obj, FBMesh):
+            return "Mesh"
+        elif isinstance(obj, SCENE_OBJECT_TYPES):
+            return "SceneObject"
+        elif isinstance(obj, FBNamespace):
+            return "Namespace"
+        return "Other"
+
+    # Adds a component to the index, unless it's already in it. Each entry is [obj, name, longName, namespace, typeBucket]. Build skips the check, as it starts from an empty index.
+    def Add(self, obj, checkIndexed = True):
+        if checkIndexed and self.FindEntryId(obj, False) is not None:
+            return
+        try:
+            entry = [obj, obj.Name, obj.LongName, GetNamespaceForObject(obj), self.GetTypeBucket(obj)]
+        except:
+            return
+        entryId = self.nextEntryId
+        self.nextEntryId += 1
+        self.entries[entryId] = entry
+        self.byName.setdefault(entry[1], {})[entryId] = obj
+        self.byLongName.setdefault(entry[2], {})[entryId] = obj
+        self.byNamespace.setdefault(entry[3], {})[entryId] = obj
+        self.byType.setdefault(entry[4], {})[entryId] = obj
+        try:
+            if obj.Selected:
+                self.selected[entryId] = obj
+        except:
+            pass
+
+    # Finds the entry id for a component, looking it up by its long name first, and only going through every entry if that fails (and fullScan is True).
+    def FindEntryId(self, obj, fullScan = True):
+        try:
+            for entryId, indexedObj in self.byLongName.get(obj.LongName, {}).items():
+                if indexedObj == obj:
+                    return entryId
+        except:
+            pass
+        if fullScan:
+            for entryId, entry in self.entries.items():
+                if entry[0] == obj:
+                    return entryId
+
+    # Removes a component from the index.
+    def Remove(self, obj):
+        entryId = self.FindEntryId(obj)
+        if entryId is not None:
+            entry = self.entries.pop(entryId)
+            self.selected.pop(entryId, None)
+            for table, key in [[self.byName, entry[1]], [self.byLongName, entry[2]], [self.byNamespace, entry[3]], [self.byType, entry[4]]]:
+                bucket = table[key]
+                del bucket[entryId]
+                if not bucket:
+                    del table[key]
+
+    # Builds the index from the scene components.
+    def Build(self):
+        self.Clear()
+        for obj in GetSceneComponents():
+            self.Add(obj, False)
+        self.built = True
+        self.selectionConfirmed = True
+
+    # Registers the scene change and file callbacks that keep the index up to date.
+    def RegisterCallbacks(self):
+        try:
+            FBSystem().Scene.OnChange.Add(self.OnSceneChange)
+            FBApplication().OnFileNewCompleted.Add(self.OnFileChange)
+            FBApplication().OnFileOpenCompleted.Add(self.OnFileChange)
+            FBApplication().OnFileExit.Add(self.OnFileExit)
+            self.callbacksRegistered = True
+        except:
+            self.callbacksRegistered = False
+
+    # Removes the callbacks.
+    def UnregisterCallbacks(self):
+        if self.callbacksRegistered:
+            try:
+                FBSystem().Scene.OnChange.Remove(self.OnSceneChange)
+                FBApplication().OnFileNewCompleted.Remove(self.OnFileChange)
+                FBApplication().OnFileOpenCompleted.Remove(self.OnFileChange)
+                FBApplication().OnFileExit.Remove(self.OnFileExit)
+            except:
+                pass
+            self.callbacksRegistered = False
+        self.Clear()
+
+    # Builds the index if it hasn't been built, or if there are no callbacks to keep it up to date.
+    def Update(self):
+        if not self.callbacksRegistered:
+            self.RegisterCallbacks()
+        if not self.built or not self.callbacksRegistered:
+            self.Build()
+
+    # Scene change callback. Attach and detach events also fire for connections between components (parenting, materials, constraints, etc.), so they only count as a component being added to or removed from the scene when they come from the scene itself. Components being renamed are removed before the rename, and added back after it.
+    def OnSceneChange(self, control, event):
+        if self.built:
+            eventType = event.Type
+            if eventType in [FBSceneChangeType.kFBSceneChangeAttach, FBSceneChangeType.kFBSceneChangeDetach]:
+                if isinstance(event.Component, FBScene):
+                    if eventType == FBSceneChangeType.kFBSceneChangeAttach:
+                        self.Add(event.ChildComponent)
+                    else:
+                        self.Remove(event.ChildComponent)
+            elif eventType in SCENE_CHANGE_RENAMED_TYPES:
+                self.Add(GetSceneChangeComponent(event))
+            elif eventType in [FBSceneChangeType.kFBSceneChangeDestroy] + SCENE_CHANGE_RENAME_TYPES:
+                self.Remove(GetSceneChangeComponent(event))
+            elif eventType == FBSceneChangeType.kFBSceneChangeSelect:
+                obj = GetSceneChangeComponent(event)
+                entryId = self.FindEntryId(obj)
+                if entryId is not None:
+                    self.selected[entryId] = obj
+                else:
+                    self.selectionConfirmed = False
+            elif eventType == FBSceneChangeType.kFBSceneChangeUnselect:
+                entryId = self.FindEntryId(GetSceneChangeComponent(event))
+                if entryId is not None:
+                    self.selected.pop(entryId, None)
+                else:
+                    self.selectionConfirmed = False
+
+    # File new and file open callback.
+    def OnFileChange(self, control, event):
+        self.Clear()
+
+    # File exit callback.
+    def OnFileExit(self, control, event):
+        self.UnregisterCallbacks()
+
+    # Gets the components for a list of entry ids, in scene order.
+    def GetEntries(self, entryIds):
+        return [self.entries[entryId][0] for entryId in sorted(entryIds)]
+
+    # Gets every component in the index.
+    def GetComponents(self):
+        self.Update()
+        return [entry[0] for entry in self.entries.values()]
+
+    # Gets the index entries for the components with an exact name (or long name).
+    def GetNameEntries(self, name, includeNamespace = True):
+        self.Update()
+        table = self.byLongName if includeNamespace else self.byName
+        return [self.entries[entryId] for entryId in table.get(name, {})]
+
+    # Gets the components with an exact name (or long name).
+    def GetByName(self, name, includeNamespace = True):
+        return [entry[0] for entry in self.GetNameEntries(name, includeNamespace)]
+
+    # Gets the components with an exact namespace. The namespace includes the trailing ":".
+    def GetByNamespace(self, namespace):
+        self.Update()
+        return list(self.byNamespace.get(namespace, {}).values())
+
+    # Gets the components whose namespace contains a search string.
+    def GetByNamespaceWildcard(self, searchNamespace):
+        self.Update()
+        entryIds = []
+        for namespace, bucket in self.byNamespace.items():
+            if namespace and searchNamespace in namespace:
+                entryIds.extend(bucket.keys())
+        return self.GetEntries(entryIds)
+
+    # Gets the components in a type bucket.
+    def GetByType(self, typeBucket):
+        self.Update()
+        return list(self.byType.get(typeBucket, {}).values())
+
+    # Rescans the selection from the components in the index, for when the tracked selection is out of sync.
+    def ResyncSelection(self):
+        self.selected = {}
+        for entryId, entry in self.entries.items():
+            try:
+                if entry[0].Selected:
+                    self.selected[entryId] = entry[0]
+            except:
+                pass
+        self.selectionConfirmed = True
+
+    # Marks nothing as selected, after everything in the scene has been deselected.
+    def ClearSelection(self):
+        self.selected = {}
+        self.selectionConfirmed = True
+
+    # Gets the index entries for the selected components, in scene order.
+    def GetSelectedEntries(self):
+        self.Update()
+        entries = [self.entries[entryId] for entryId in sorted(self.selected)]
+        try:
+            inSync = self.selectionConfirmed and all([entry[0].Selected for entry in entries])
+        except:
+            inSync = False
+        if not inSync:
+            self.ResyncSelection()
+            entries = [self.entries[entryId] for entryId in sorted(self.selected)]
+        return entries
+
+    # Gets the index entries, for lookups that need to search the names themselves (e.g. wildcard searches). This is a view of the index rather than a copy, so a search can stop at the first match without copying every entry.
+    def GetIndexEntries(self):
+        self.Update()
+        return self.entries.values()
+
+# Gets the component that a scene change event is about. When the event comes from the scene itself, the component is the child component.
+def GetSceneChangeComponent(event):
+    obj = event.Component
+    if isinstance(obj, FBScene):
+        obj = event.ChildComponent
+    return obj
+
+sceneComponentIndex = SceneComponentIndex()
+
+# Gets the scene component index.
+def GetSceneComponentIndex():
+    return sceneComponentIndex
 
 '''
 The following functions are for finding objects from the scene and adding them to variables.
@@ -69,35 +337,19 @@ def FindByNameMobu(name, includeNamespace = True, modelsOnly = True):
         components = components[0]
     return components
 
-# Filter the search results of FindByName (see below)
-def SearchFiltering(obj, name, includeNamespace, includeWildcards, foundObjects):
-    if includeNamespace:
-        if includeWildcards:
-            if name in obj.LongName:
-                foundObjects.append(obj)
-        else:
-            if obj.LongName == name:
-                foundObjects.append(obj)
-    else:
-        if includeWildcards:
-            if name in obj.Name:
-                foundObjects.append(obj)
-        else:
-            if name == obj.Name:
-                foundObjects.append(obj)
-    return foundObjects
-
 # Find objects from the scene. Supports wildcards.
 def FindByName(name, includeWildcards = False, includeNamespace = True, sceneObjectsOnly = False, returnSingleObj = False):
-    foundObjects = []
-    comps = GetSceneComponents()
-    for obj in comps:
-        if not isinstance(obj, FBMesh):
-            if sceneObjectsOnly:
-                if isinstance(obj, FBModel) or isinstance(obj, FBModelMarker) or isinstance(obj, FBModelSkeleton) or isinstance(obj, FBModelNull) or isinstance(obj, FBCamera):
-                    SearchFiltering(obj, name, includeNamespace, includeWildcards, foundObjects)
-            else:
-                SearchFiltering(obj, name, includeNamespace, includeWildcards, foundObjects)
+    index = GetSceneComponentIndex()
+    if includeWildcards:
+        nameIndex = 2 if includeNamespace else 1
+        entries = (entry for entry in index.GetIndexEntries() if name in entry[nameIndex])
+    else:
+        entries = index.GetNameEntries(name, includeNamespace)
+    foundObjects = (entry[0] for entry in entries if entry[4] != "Mesh" and (not sceneObjectsOnly or entry[4] == "SceneObject"))
+    if returnSingleObj:
+        foundObjects = [obj for obj in itertools.islice(foundObjects, 1)]
+    else:
+        foundObjects = list(foundObjects)
     if len(foundObjects) == 0:
         pass
         #print 'Search for "%s" found nothing' % (name)
@@ -108,14 +360,10 @@ def FindByName(name, includeWildcards = False, includeNamespace = True, sceneObj
 # Getting the selected objects from the scene.
 def GetSelected(sceneObjectsOnly = True):
     foundObjects = []
-    components = GetSceneComponents()
-    for obj in components:
-        if not isinstance(obj, FBMesh) and obj.Selected:
-            if sceneObjectsOnly:
-                if isinstance(obj, FBModel) or isinstance(obj, FBModelMarker) or isinstance(obj, FBModelSkeleton) or isinstance(obj, FBModelNull) or isinstance(obj, FBCamera):
-                    foundObjects.append(obj)
-            else:
-                foundObjects.append(obj)
+    for entry in GetSceneComponentIndex().GetSelectedEntries():
+        if entry[4] != "Mesh":
+            if not sceneObjectsOnly or entry[4] == "SceneObject":
+                foundObjects.append(entry[0])
     if len(foundObjects) == 0:
         print('No objects selected')
     elif len(foundObjects) == 1:
@@ -127,18 +375,12 @@ def FindByNamespace(searchNamespace, wildcardSearch = False):
     if not wildcardSearch:
         if searchNamespace[-1] != ":":
             searchNamespace = searchNamespace + ":"
-    foundObjects = []
-    components = GetSceneComponents()
-    for obj in components:
-        if not isinstance(obj, FBNamespace):
-            objectNamespace = GetNamespaceForObject(obj)
-            if objectNamespace:
-                if wildcardSearch:
-                    if searchNamespace in objectNamespace:
-                        foundObjects.append(obj)
-                else:
-                    if searchNamespace == objectNamespace:
-                        foundObjects.append(obj)
+    index = GetSceneComponentIndex()
+    if wildcardSearch:
+        components = index.GetByNamespaceWildcard(searchNamespace)
+    else:
+        components = index.GetByNamespace(searchNamespace)
+    foundObjects = [obj for obj in components if not isinstance(obj, FBNamespace)]
     if len(foundObjects) == 1:
         foundObjects = foundObjects[0]
     elif foundObjects == []:
@@ -146,15 +388,195 @@ def FindByNamespace(searchNamespace, wildcardSearch = False):
     return foundObjects
 
 '''
-The following functions is for adding branches to lists.
-'''
+The following are for querying hierarchies from a snapshot of the scene, rather than walking .Children and .Parent for every query. The snapshot is built in one pass over the scene (without recursion, so there's no limit to how deep a hierarchy can be). Models are stored in depth first order, with the index of each model's parent, its depth, and the end of its branch, so a model's branch is every model between it and the end of its branch.
+
+The snapshot is thrown away when models are parented, unparented, added, deleted or renamed, or a new file is started or opened, and built again the next time it's used. If the scene change callback can't be registered, it's built again for every query. Objects that aren't in the snapshot are walked directly.
+
+Building the snapshot means going through the whole scene, so it's only built for the functions that query a list of objects (GetBranches, FindTopObjects, GetHierarchyDepths and FindCommonAncestor). The single object functions (AddBranchToList and FindTopObject) use the snapshot if it's already built and up to date, and otherwise walk .Parent or .Children directly, so calling them in a loop that changes the scene doesn't rebuild the snapshot every time.
+'''
+
+class HierarchySnapshot(object):
+    def __init__(self):
+        self.callbacksRegistered = False
+        self.Clear()
+
+    # Throws the snapshot away, so that it's built again the next time it's used.
+    def Clear(self):
+        self.built = False
+        self.models = []
+        self.parentIndices = []
+        self.depths = []
+        self.branchEnds = []
+        self.byLongName = {}
+
+    # Builds the snapshot from the scene's root model.
+    def Build(self):
+        self.Clear()
+        stack = [[child, -1, 0] for child in reversed(list(FBSystem().Scene.RootModel.Children))]
+        openBranches = []
+        while stack:
+            model, parentIndex, depth = stack.pop()
+            while openBranches and self.depths[openBranches[-1]] >= depth:
+                self.branchEnds[openBranches.pop()] = len(self.models)
+            modelIndex = len(self.models)
+            self.models.append(model)
+            self.parentIndices.append(parentIndex)
+            self.depths.append(depth)
+            self.branchEnds.append(modelIndex + 1)
+            self.byLongName.setdefault(model.LongName, []).append(modelIndex)
+            openBranches.append(modelIndex)
+            for child in reversed(list(model.Children)):
+                stack.append([child, modelIndex, depth + 1])
+        for modelIndex in openBranches:
+            self.branchEnds[modelIndex] = len(self.models)
+        self.built = True
+
+    # Registers the scene change and file callbacks that throw the snapshot away when the hierarchy changes.
+    def RegisterCallbacks(self):
+        try:
+            FBSystem().Scene.OnChange.Add(self.OnSceneChange)
+            FBApplication().OnFileNewCompleted.Add(self.OnFileChange)
+            FBApplication().OnFileOpenCompleted.Add(self.OnFileChange)
+            FBApplication().OnFileExit.Add(self.OnFileExit)
+            self.callbacksRegistered = True
+        except:
+            self.callbacksRegistered = False
+
+    # Removes the callbacks.
+    def UnregisterCallbacks(self):
+        if self.callbacksRegistered:
+            try:
+                FBSystem().Scene.OnChange.Remove(self.OnSceneChange)
+                FBApplication().OnFileNewCompleted.Remove(self.OnFileChange)
+                FBApplication().OnFileOpenCompleted.Remove(self.OnFileChange)
+                FBApplication().OnFileExit.Remove(self.OnFileExit)
+            except:
+                pass
+            self.callbacksRegistered = False
+        self.Clear()
+
+    # Checks if the snapshot is built and being kept up to date, so it can be used without building it.
+    def IsCurrent(self):
+        return self.built and self.callbacksRegistered
+
+    # Builds the snapshot if it hasn't been built, or if there's no callback to keep it up to date.
+    def Update(self):
+        if not self.callbacksRegistered:
+            self.RegisterCallbacks()
+        if not self.built or not self.callbacksRegistered:
+            self.Build()
+
+    # Scene change callback.
+    def OnSceneChange(self, control, event):
+        if self.built and event.Type in [FBSceneChangeType.kFBSceneChangeAddChild, FBSceneChangeType.kFBSceneChangeRemoveChild, FBSceneChangeType.kFBSceneChangeAttach, FBSceneChangeType.kFBSceneChangeDetach, FBSceneChangeType.kFBSceneChangeDestroy, FBSceneChangeType.kFBSceneChangeRenamed, FBSceneChangeType.kFBSceneChangeRenamedPrefix]:
+            self.Clear()
+
+    # File new and file open callback.
+    def OnFileChange(self, control, event):
+        self.Clear()
+
+    # File exit callback.
+    def OnFileExit(self, control, event):
+        self.UnregisterCallbacks()
+
+    # Gets the snapshot index of a model, or None if it isn't in the snapshot.
+    def GetModelIndex(self, model):
+        self.Update()
+        try:
+            for modelIndex in self.byLongName.get(model.LongName, []):
+                if self.models[modelIndex] == model:
+                    return modelIndex
+        except:
+            pass
 
-# Support function for AddBranchToList.
-def AddBranchToListLoop(topModel, listOfObjs = []):
-    for childModel in topModel.Children:
-        #print topModel.Name + ": " + childModel.Name 
-        listOfObjs.append(childModel)
-        AddBranchToListLoop(childModel, listOfObjs)
+    # Gets the models under a model, in depth first order.
+    def GetBranch(self, model):
+        modelIndex = self.GetModelIndex(model)
+        if modelIndex is None:
+            return GetBranchFromChildren(model)
+        return self.models[modelIndex + 1:self.branchEnds[modelIndex]]
+
+    # Gets the top model of the hierarchy a model is in.
+    def GetRoot(self, model):
+        modelIndex = self.GetModelIndex(model)
+        if modelIndex is None:
+            return GetRootFromParents(model)
+        while self.parentIndices[modelIndex] != -1:
+            modelIndex = self.parentIndices[modelIndex]
+        return self.models[modelIndex]
+
+    # Gets the depth of a model, where top models have a depth of 0.
+    def GetDepth(self, model):
+        modelIndex = self.GetModelIndex(model)
+        if modelIndex is None:
+            return len(GetParentsFromModel(model))
+        return self.depths[modelIndex]
+
+    # Gets the lowest model that all of the models in a list are under (or are), or None if they aren't in the same hierarchy.
+    def GetCommonAncestor(self, objList):
+        chains = []
+        for model in objList:
+            modelIndex = self.GetModelIndex(model)
+            if modelIndex is None:
+                chain = list(reversed([model] + GetParentsFromModel(model)))
+            else:
+                chain = []
+                while modelIndex != -1:
+                    chain.append(self.models[modelIndex])
+                    modelIndex = self.parentIndices[modelIndex]
+                chain.reverse()
+            chains.append(chain)
+        commonAncestor = None
+        for models in zip(*chains):
+            if all([model == models[0] for model in models[1:]]):
+                commonAncestor = models[0]
+            else:
+                break
+        return commonAncestor
+
+# Gets the parents of a model, from its parent up to its top model.
+def GetParentsFromModel(model):
+    parents = []
+    parent = model.Parent
+    while parent != None:
+        parents.append(parent)
+        parent = parent.Parent
+    return parents
+
+# Gets the top model by walking up .Parent, for models that aren't in the hierarchy snapshot.
+def GetRootFromParents(model):
+    parents = GetParentsFromModel(model)
+    return parents[-1] if parents else model
+
+# Gets the models under a model by walking .Children, in depth first order, for models that aren't in the hierarchy snapshot.
+def GetBranchFromChildren(topModel):
+    branch = []
+    stack = list(reversed(list(topModel.Children)))
+    while stack:
+        model = stack.pop()
+        branch.append(model)
+        stack.extend(reversed(list(model.Children)))
+    return branch
+
+hierarchySnapshot = HierarchySnapshot()
+
+# Gets the hierarchy snapshot.
+def GetHierarchySnapshot():
+    return hierarchySnapshot
+
+'''
+The following functions are for adding branches to lists.
+'''
+
+# Support function for AddBranchToList. Adds all children of a model to a list, in depth first order.
+def AddBranchToListLoop(topModel, listOfObjs = None):
+    if listOfObjs is None:
+        listOfObjs = []
+    snapshot = GetHierarchySnapshot()
+    if snapshot.IsCurrent():
+        listOfObjs.extend(snapshot.GetBranch(topModel))
+    else:
+        listOfObjs.extend(GetBranchFromChildren(topModel))
     return listOfObjs
 
 # Adds all children of a given object to a list.
@@ -165,47 +587,217 @@ def AddBranchToList(topModel, includeTopModel = True):
         listOfObjs.append(topModel)
     return listOfObjs
 
+# Gets the branches for a list of objects. Returns a list of [obj, branch] for each object.
+def GetBranches(objList, includeTopModel = True):
+    snapshot = GetHierarchySnapshot()
+    branches = []
+    for obj in objList:
+        branch = snapshot.GetBranch(obj)
+        if includeTopModel:
+            branch.append(obj)
+        branches.append([obj, branch])
+    return branches
+
 '''
 The following functions are for finding the top model in a hierarchy from an object in the hierarchy.
 '''
 
 # Finds the top object in a hierarchy when given an object lower down in the hierarchy.
 def FindTopObject(hierarchyObj):
-    count = 0
-    if not hierarchyObj.Parent:
-        topObj = hierarchyObj
-    else:
-        topObj = None
-        parent = hierarchyObj
-        while parent != None and count < 100:
-            parent = parent.Parent
-            if parent != None:
-                topObj = parent
-            count += 1
-    return topObj   
+    snapshot = GetHierarchySnapshot()
+    if snapshot.IsCurrent():
+        return snapshot.GetRoot(hierarchyObj)
+    return GetRootFromParents(hierarchyObj)
+
+# Finds the top objects for a list of objects. Returns a list of [obj, topObj] for each object.
+def FindTopObjects(objList):
+    snapshot = GetHierarchySnapshot()
+    return [[obj, snapshot.GetRoot(obj)] for obj in objList]
+
+# Gets the depths in their hierarchies for a list of objects, where top objects have a depth of 0. Returns a list of [obj, depth] for each object.
+def GetHierarchyDepths(objList):
+    snapshot = GetHierarchySnapshot()
+    return [[obj, snapshot.GetDepth(obj)] for obj in objList]
+
+# Finds the lowest object that all of the objects in a list are under (or are), or None if they aren't in the same hierarchy.
+def FindCommonAncestor(objList):
+    return GetHierarchySnapshot().GetCommonAncestor(objList)
 
 '''
 The following functions are for getting lists of files.
+
+IterFilePaths yields the file paths under a folder one at a time, reading each folder once with os.scandir. Folders are read a level at a time, and the folders in a level are read on a pool of threads, which helps a lot on network shares where each call has to wait on the server. On Python 2.7, which has neither os.scandir nor concurrent.futures, folders are read one at a time with os.listdir instead. Folders named like a file with a 3 letter extension (e.g. the .fbm media folders saved next to fbx files) are skipped, along with everything in them.
+
+Given a FileIndexCache, a folder that hasn't been modified since it was cached isn't read again, so scanning an unchanged share only has to stat its folders. A folder's modified time changes when something is added, removed or renamed in it, which is all that the cached names depend on.
 '''
 
+FILE_INDEX_CACHE_VERSION = 1
+
+class FileIndexCache(object):
+    def __init__(self, cachePath = None):
+        self.cachePath = cachePath
+        self.folders = {}
+        self.changed = False
+        if cachePath:
+            self.Load()
+
+    # Loads the cache file, if there is one. A missing, unreadable or old cache file just gives an empty cache.
+    def Load(self):
+        self.folders = {}
+        try:
+            with open(self.cachePath, "r") as cacheFile:
+                data = json.load(cacheFile)
+            if data.get("version") == FILE_INDEX_CACHE_VERSION:
+                self.folders = data["folders"]
+        except (IOError, OSError, ValueError, KeyError, AttributeError):
+            pass
+        self.changed = False
+
+    # Saves the cache file, if anything has changed since it was loaded.
+    def Save(self):
+        if self.cachePath and self.changed:
+            folderPath = os.path.dirname(self.cachePath)
+            if folderPath and not os.path.exists(folderPath):
+                os.makedirs(folderPath)
+            tempPath = self.cachePath + ".tmp"
+            with open(tempPath, "w") as cacheFile:
+                json.dump({"version": FILE_INDEX_CACHE_VERSION, "folders": self.folders}, cacheFile)
+            if hasattr(os, "replace"):
+                os.replace(tempPath, self.cachePath)
+            else:
+                if os.path.exists(self.cachePath):
+                    os.remove(self.cachePath)
+                os.rename(tempPath, self.cachePath)
+            self.changed = False
+
+    # Gets the cached [fileNames, folderNames] for a folder, or None if it isn't cached or has been modified since.
+    def GetEntries(self, folderPath, modifiedTime):
+        entry = self.folders.get(folderPath)
+        if entry and entry[0] == modifiedTime:
+            return [entry[1], entry[2]]
+
+    # Caches the file and sub-folder names for a folder.
+    def SetEntries(self, folderPath, modifiedTime, fileNames, folderNames):
+        self.folders[folderPath] = [modifiedTime, fileNames, folderNames]
+        self.changed = True
+
+    # Removes the cached folders under a folder that aren't in seenFolderPaths, i.e. folders that have been deleted since they were cached.
+    def RemoveUnseen(self, dataPath, seenFolderPaths):
+        prefix = os.path.join(dataPath, "")
+        for folderPath in list(self.folders):
+            if (folderPath == dataPath or folderPath.startswith(prefix)) and folderPath not in seenFolderPaths:
+                del self.folders[folderPath]
+                self.changed = True
+
+# Gets the default file index cache path.
+def GetFileIndexCachePath():
+    return GetMBDirectory() + "FileIndexCache.json"
+
+# Checks if a folder name looks like a file with a 3 letter extension, e.g. the .fbm media folders saved next to fbx files.
+def IsFileLikeFolderName(folderName):
+    return folderName[-4:-3] == "."
+
+# Lists the file and sub-folder names in a folder. Uses os.scandir where it's available, and os.listdir on Python 2.7. Returns [fileNames, folderNames].
+def ListFolder(folderPath):
+    fileNames = []
+    folderNames = []
+    if hasattr(os, "scandir"):
+        with os.scandir(folderPath) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks = False):
+                        folderNames.append(entry.name)
+                    elif entry.is_file():
+                        fileNames.append(entry.name)
+                except OSError:
+                    continue
+    else:
+        for name in os.listdir(folderPath):
+            path = os.path.join(folderPath, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                folderNames.append(name)
+            elif os.path.isfile(path):
+                fileNames.append(name)
+    return [fileNames, folderNames]
+
+# Reads the file and sub-folder names in a folder, from the cache if the folder hasn't been modified since it was cached. Returns [modifiedTime, fileNames, folderNames, fromCache], or None if the folder can't be read.
+def ReadFolder(folderPath, cache = None):
+    try:
+        folderStat = os.stat(folderPath)
+        modifiedTime = getattr(folderStat, "st_mtime_ns", folderStat.st_mtime)
+        if cache:
+            entries = cache.GetEntries(folderPath, modifiedTime)
+            if entries:
+                return [modifiedTime, entries[0], entries[1], True]
+        fileNames, folderNames = ListFolder(folderPath)
+    except OSError:
+        return None
+    return [modifiedTime, fileNames, folderNames, False]
+
+# Creates the thread pool for reading folders, or returns None if workerCount is 1 or concurrent.futures isn't available (e.g. on Python 2.7), in which case folders are read one at a time.
+def CreateFolderReadExecutor(workerCount):
+    if workerCount <= 1:
+        return None
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+    except ImportError:
+        return None
+    return ThreadPoolExecutor(max_workers = workerCount)
+
+# Yields the full file paths in a folder, including sub-folders. extensions is a list of extensions to keep (e.g. [".fbx", ".c3d"]) and patterns is a list of file name patterns to keep (e.g. ["*_Walk*"]). Both are case insensitive, and a file has to match both if both are given. cache is an optional FileIndexCache (it isn't saved here), and workerCount is the number of threads to read folders with.
+def IterFilePaths(dataPath, extensions = None, patterns = None, cache = None, workerCount = 8):
+    if extensions:
+        extensions = tuple([("." + extension.lstrip(".")).lower() for extension in extensions])
+    if patterns:
+        patterns = [pattern.lower() for pattern in patterns]
+    folderPaths = [dataPath]
+    seenFolderPaths = set()
+    executor = CreateFolderReadExecutor(workerCount)
+    futures = []
+    try:
+        while folderPaths:
+            if executor and len(folderPaths) > 1:
+                futures = [executor.submit(ReadFolder, folderPath, cache) for folderPath in folderPaths]
+                results = (future.result() for future in futures)
+            else:
+                results = (ReadFolder(folderPath, cache) for folderPath in folderPaths)
+            nextFolderPaths = []
+            for folderPath, result in zip(folderPaths, results):
+                if result is None:
+                    continue
+                modifiedTime, fileNames, folderNames, fromCache = result
+                seenFolderPaths.add(folderPath)
+                if cache and not fromCache:
+                    cache.SetEntries(folderPath, modifiedTime, fileNames, folderNames)
+                for fileName in fileNames:
+                    lowerFileName = fileName.lower()
+                    if extensions and not lowerFileName.endswith(extensions):
+                        continue
+                    if patterns and not any(fnmatch.fnmatchcase(lowerFileName, pattern) for pattern in patterns):
+                        continue
+                    yield os.path.join(folderPath, fileName)
+                for folderName in folderNames:
+                    if not IsFileLikeFolderName(folderName):
+                        nextFolderPaths.append(os.path.join(folderPath, folderName))
+            folderPaths = nextFolderPaths
+        if cache:
+            cache.RemoveUnseen(dataPath, seenFolderPaths)
+    finally:
+        for future in futures:
+            future.cancel()
+        if executor:
+            executor.shutdown()
+
 # Gets a file list for a folder.
 def GetFileList(dataPath):
-    files = [f for f in os.listdir(dataPath) if os.path.isfile(os.path.join(dataPath, f))]
-    return files
-
-# Gets full file paths for a folder, including sub-directories.
-def GetFilePaths(dataPath):
-    dirs = []
-    for x in os.walk(dataPath):
-        path = str(x[0])
-        pathTemp = path[:-3]
-        if not pathTemp.endswith("."):
-            dirs.append(path)
-    fileList = []
-    for folderPath in dirs:
-        currentFolderFiles = GetFileList(folderPath)
-        for f in currentFolderFiles:
-            fileList.append(folderPath + "\\" + f)
+    return ListFolder(dataPath)[0]
+
+# Gets full file paths for a folder, including sub-folders (see IterFilePaths). With useCache, folders that haven't changed since the last scan are read from the file index cache in the Documents\MB folder.
+def GetFilePaths(dataPath, extensions = None, patterns = None, useCache = False):
+    cache = FileIndexCache(GetFileIndexCachePath()) if useCache else None
+    fileList = list(IterFilePaths(dataPath, extensions, patterns, cache))
+    if cache:
+        cache.Save()
     return fileList
 
 '''
@@ -333,11 +925,7 @@ def GetControlRigFKEffectors(character = None):
         character = FBApplication().CurrentCharacter
     fkEffectors = []
     if character:
-        for nodeId in FBBodyNodeId.values.values():
-            if nodeId not in [FBBodyNodeId.kFBInvalidNodeId, FBBodyNodeId.kFBLastNodeId]:
-                effector = character.GetCtrlRigModel(nodeId)
-                if effector:
-                    fkEffectors.append(effector)
+        fkEffectors = [effector for nodeId, effector in GetCharacterRigDescriptor(character).fkEffectors]
         if fkEffectors == []:
             fkEffectors = None
     return fkEffectors
@@ -348,13 +936,9 @@ def GetControlRigIKEffectors(character = None):
         character = FBApplication().CurrentCharacter
     ikEffectors = []
     if character:
-        ctrlRig = GetControlRigForCharacter(character)
-        if ctrlRig:
-            for nodeId in FBEffectorId.values.values():
-                if nodeId not in [FBEffectorId.kFBInvalidEffectorId, FBEffectorId.kFBLastEffectorId]:
-                    effector = ctrlRig.GetIKEffectorModel(nodeId, 0)
-                    if effector:
-                        ikEffectors.append(effector)
+        rigDescriptor = GetCharacterRigDescriptor(character)
+        if rigDescriptor.controlRig:
+            ikEffectors = [effector for nodeId, effector in rigDescriptor.ikEffectors]
             if ikEffectors == []:
                 ikEffectors = None
     return ikEffectors
@@ -369,11 +953,10 @@ def GetControlRigEffectors(character = None):
 
 # Gets a control rig effector by name.
 def GetEffectorByName(effectorName, character = None):
-    effectors = GetControlRigEffectors(character)
+    rigDescriptor = GetCharacterRigDescriptor(character)
     effectorToReturn = None
-    for effector in effectors:
-        if effector.Name == effectorName:
-            effectorToReturn = effector
+    if rigDescriptor:
+        effectorToReturn = rigDescriptor.effectorsByName.get(effectorName)
     return effectorToReturn
 
 '''
@@ -387,11 +970,16 @@ def DeleteNonBaseLayers():
         if layer.Name != "BaseAnimation":
             layer.FBDelete()
 
-# Deletes all layers (not uncluding base layer), for takes list.
-def DeleteNonBaseLayersForTakes(takesList):
-    for take in takesList:
-        FBSystem().CurrentTake = take
-        DeleteNonBaseLayers()
+# Deletes all layers (not uncluding base layer) from a take, without making it the current take.
+def DeleteNonBaseLayersForTake(take):
+    layers = [take.GetLayer(i) for i in range(take.GetLayerCount())]
+    for layer in layers:
+        if layer.Name != "BaseAnimation":
+            layer.FBDelete()
+
+# Deletes all layers (not uncluding base layer), for takes list. Takes aren't switched, and a take that fails doesn't stop the other takes. Returns the take batch report (see RunForTakes).
+def DeleteNonBaseLayersForTakes(takesList, progressCallback = None, cancelCallback = None):
+    return RunForTakes(takesList, DeleteNonBaseLayersForTake, progressCallback, cancelCallback, switchTakes = False)
 
 # Bakes down layers.
 def BakeDownLayers(objsToBake, layerNameToRemove = None):
@@ -399,7 +987,7 @@ def BakeDownLayers(objsToBake, layerNameToRemove = None):
         objsToBake = [objsToBake]
     take = FBSystem().CurrentTake
     take.SetCurrentLayer(0)
-    FastPlotList(objsToBake)
+    FastPlotList(objsToBake) # Plots straight away, even inside an open plot scheduler, because the layers are deleted next.
     layers = GetLayers()
     if not layerNameToRemove:
         for layer in layers:
@@ -438,45 +1026,68 @@ def GetClosestValue(value, valueList = None):
 The following functions are for getting the speed of an object.
 '''
 
-# Gets the translation values for an object for a given frame, from an objects curves.
-def GetTranslationValueFromCurves(obj, frame):
-    transFound = False
+class FCurveKeyIndex(object):
+    def __init__(self, fcurve):
+        self.fcurve = fcurve
+        keys = fcurve.Keys
+        self.frames = [key.Time.GetFrame() for key in keys]
+        self.values = [key.Value for key in keys]
+
+    # Gets the value of the key on a frame, or None if there's no key on that frame.
+    def GetKeyValue(self, frame):
+        keyIndex = bisect.bisect_left(self.frames, frame)
+        if keyIndex < len(self.frames) and self.frames[keyIndex] == frame:
+            return self.values[keyIndex]
+
+# Gets a key index for each of an object's translation curves (on the current layer), or None if its translation isn't animated.
+def GetTranslationKeyIndices(obj):
     animNode = obj.PropertyList.Find("Lcl Translation").GetAnimationNode()
     if animNode:
         nodes = animNode.Nodes
-        keyValues = {}
         if len(nodes) == 3:
-            for i in range(len(nodes)):
-                fcurve = nodes[i].FCurve
-                for key in fcurve.Keys:
-                    if key.Time.GetFrame() == frame:
-                        keyValues[i] = key.Value
-            if len(keyValues) == 3:
-                transFound = True
-                return FBVector3d(keyValues[0], keyValues[1], keyValues[2])
-    if not transFound:
-        FBPlayerControl().Goto(FBTime(0,0,0,frame))
-        return FBVector3d(obj.Translation[0], obj.Translation[1], obj.Translation[2])
-
-# Gets the speed of an object between a given frame range (assumes movement in a straight line).
+            return [FCurveKeyIndex(node.FCurve) for node in nodes]
+
+# Gets the translation values for a list of [obj, frame] pairs. Frames where all of an object's translation curves have a key use the key values, and each object's keys are only read once, however many frames are asked for. Other frames, objects without translation curves, and takes with more than one layer (where the current layer's keys aren't the final values) move the timeline to the frame and use the evaluated translation. Returns an FBVector3d for each pair, in the same order.
+def GetTranslationValuesFromCurves(objFrames):
+    useKeys = FBSystem().CurrentTake.GetLayerCount() == 1
+    keyIndexLookup = {}
+    translations = []
+    for obj, frame in objFrames:
+        keyValues = [None]
+        if useKeys:
+            keyIndices = None
+            for lookupObj, lookupKeyIndices in keyIndexLookup.get(obj.LongName, []):
+                if lookupObj == obj:
+                    keyIndices = lookupKeyIndices
+                    break
+            else:
+                keyIndices = GetTranslationKeyIndices(obj)
+                keyIndexLookup.setdefault(obj.LongName, []).append([obj, keyIndices])
+            if keyIndices:
+                keyValues = [keyIndex.GetKeyValue(frame) for keyIndex in keyIndices]
+        if None not in keyValues:
+            translations.append(FBVector3d(keyValues[0], keyValues[1], keyValues[2]))
+        else:
+            FBPlayerControl().Goto(FBTime(0,0,0,frame))
+            translations.append(FBVector3d(obj.Translation[0], obj.Translation[1], obj.Translation[2]))
+    return translations
+
+# Gets the translation values for an object for a given frame, from an objects curves.
+def GetTranslationValueFromCurves(obj, frame):
+    return GetTranslationValuesFromCurves([[obj, frame]])[0]
+
+# Gets the speed of an object between a given frame range (assumes movement in a straight line), in meters per second at the scene's frame rate. Returns the speed, the start and end translations, and the distance between them. For per frame speed, acceleration, path length and heading, see MobuCoreTools/Kinematics.
 def GetSpeed(obj, frameRangeStart = None, frameRangeEnd = None):
-    speed = None
     if not frameRangeStart or not frameRangeEnd:
         startEndTimes = GetStartAndEndTimes()
     if not frameRangeStart:
         frameRangeStart = startEndTimes[0]
     if not frameRangeEnd:
         frameRangeEnd = startEndTimes[1]
-    numberOfFrames = frameRangeEnd - frameRangeStart
-    startTrans = GetTranslationValueFromCurves(obj, frameRangeStart)
-    endTrans = GetTranslationValueFromCurves(obj, frameRangeEnd)
+    startTrans, endTrans = GetTranslationValuesFromCurves([[obj, frameRangeStart], [obj, frameRangeEnd]])
     distance = GetDistance(startTrans, endTrans)
-    speed = ((distance / numberOfFrames) * 30.0) / 100.0
-    if speed != None:
-        return speed, startTrans, endTrans, distance
-    else:
-        return None
-        print("Speed not found for %s" % (obj.LongName))
+    speed = distance / (frameRangeEnd - frameRangeStart) * FBPlayerControl().GetTransportFpsValue() / 100.0
+    return speed, startTrans, endTrans, distance
 
 '''
 The following function is for clearing the animation on an object.
@@ -506,17 +1117,9 @@ def GetCharacterExtensionObjects(character = None):
     if not character:
         character = FBApplication().CurrentCharacter
     if character:
-        characterExtentionObjects = []
-        for ext in FBSystem().Scene.CharacterExtensions:
-            attachedChar = ext.PropertyList.Find("AttachedCharacter")
-            if len(attachedChar) > 0:
-                if attachedChar[0] == character:
-                    extObjList = GetObjectsFromExtension(ext)
-                    characterExtentionObjects = characterExtentionObjects + extObjList
+        characterExtentionObjects = list(GetCharacterRigDescriptor(character).extensions)
         if characterExtentionObjects == []:
             characterExtentionObjects = None
-        else:
-            characterExtentionObjects = list(dict.fromkeys(characterExtentionObjects))
         return characterExtentionObjects
 
 '''
@@ -535,7 +1138,261 @@ def GetCharacterEffectorsAndExtensions(character = None):
         if not isinstance(extensions, list):
             extensions = [extensions]
         return effectors + extensions
-        
+
+'''
+The following are for caching what a character's rig is made of, so the effectors, extension objects and their transform animation nodes aren't looked up again for every tool run and every take. A descriptor is built the first time a character is used, and holds the FK effectors (by body node id), the IK effectors (by effector id), the effectors by name, the extension objects, and the translation and rotation animation nodes for each object. Animation nodes are got for a take and layer, so the descriptor keeps a separate set of nodes for each take and layer they've been asked for on, and fcurves are only ever got from the nodes for the current take and layer.
+
+Extension objects come from an index of which character extensions are attached to which character, built in one pass over the scene's character extensions. The index is thrown away when a character extension changes, components are added or deleted, or a new file is started or opened.
+
+Descriptors are thrown away when components are added, deleted or renamed, or a new file is started or opened. A descriptor is also built again if the character's control rig has changed, or the extension index has been rebuilt, since it was built. If the callbacks can't be registered, nothing is cached.
+'''
+
+class CharacterRigDescriptor(object):
+    __slots__ = ("character", "controlRig", "extensionIndexVersion", "fkEffectors", "ikEffectors", "effectorsByName", "extensions", "objList", "layerTransformNodes", "objIndicesByLongName")
+
+    def __init__(self, character):
+        self.character = character
+        self.controlRig = GetControlRigForCharacter(character)
+        self.extensionIndexVersion = characterExtensionIndex.Update()
+        self.fkEffectors = []
+        for nodeId in FBBodyNodeId.values.values():
+            if nodeId not in [FBBodyNodeId.kFBInvalidNodeId, FBBodyNodeId.kFBLastNodeId]:
+                effector = character.GetCtrlRigModel(nodeId)
+                if effector:
+                    self.fkEffectors.append([nodeId, effector])
+        self.ikEffectors = []
+        if self.controlRig:
+            for nodeId in FBEffectorId.values.values():
+                if nodeId not in [FBEffectorId.kFBInvalidEffectorId, FBEffectorId.kFBLastEffectorId]:
+                    effector = self.controlRig.GetIKEffectorModel(nodeId, 0)
+                    if effector:
+                        self.ikEffectors.append([nodeId, effector])
+        self.effectorsByName = {}
+        for nodeId, effector in self.fkEffectors + self.ikEffectors:
+            self.effectorsByName[effector.Name] = effector
+        self.extensions = characterExtensionIndex.GetExtensionObjects(character)
+        self.objList = list(dict.fromkeys([effector for nodeId, effector in self.fkEffectors + self.ikEffectors] + self.extensions))
+        self.layerTransformNodes = []
+        self.objIndicesByLongName = {}
+        for objIndex, obj in enumerate(self.objList):
+            self.objIndicesByLongName.setdefault(obj.LongName, []).append(objIndex)
+
+    # Checks that the control rig and character extensions are the same as when the descriptor was built.
+    def IsValid(self):
+        return GetControlRigForCharacter(self.character) == self.controlRig and characterExtensionIndex.Update() == self.extensionIndexVersion
+
+    # Gets the list of cached transform animation nodes (one entry per object, None until it's asked for) for a take and layer.
+    def GetLayerTransformNodes(self, take, layerIndex):
+        for layerTake, layerTakeIndex, transformNodes in self.layerTransformNodes:
+            if layerTakeIndex == layerIndex and layerTake == take:
+                return transformNodes
+        transformNodes = [None] * len(self.objList)
+        self.layerTransformNodes.append([take, layerIndex, transformNodes])
+        return transformNodes
+
+    # Gets the transform animation nodes for one of the descriptor's objects on a take and layer, or None if the object isn't part of this rig.
+    def GetTransformNodes(self, obj, take, layerIndex):
+        for objIndex in self.objIndicesByLongName.get(obj.LongName, []):
+            if self.objList[objIndex] == obj:
+                transformNodes = self.GetLayerTransformNodes(take, layerIndex)
+                if transformNodes[objIndex] is None:
+                    transformNodes[objIndex] = GetObjTransformNodes(obj)
+                return transformNodes[objIndex]
+
+class CharacterExtensionIndex(object):
+    def __init__(self):
+        self.callbacksRegistered = False
+        self.version = 0
+        self.Clear()
+
+    # Throws the index away, so that it's built again the next time it's used.
+    def Clear(self):
+        self.built = False
+        self.characterEntries = []
+
+    # Builds the index in one pass over the scene's character extensions. Each entry is [character, extensions, extensionObjects].
+    def Build(self):
+        self.Clear()
+        for ext in FBSystem().Scene.CharacterExtensions:
+            attachedChar = ext.PropertyList.Find("AttachedCharacter")
+            if len(attachedChar) > 0:
+                entry = self.GetEntry(attachedChar[0])
+                if not entry:
+                    entry = [attachedChar[0], [], []]
+                    self.characterEntries.append(entry)
+                entry[1].append(ext)
+                entry[2].extend(GetObjectsFromExtension(ext) or [])
+        for entry in self.characterEntries:
+            entry[2] = list(dict.fromkeys(entry[2]))
+        self.built = True
+        self.version += 1
+
+    # Registers the scene change and file callbacks that throw the index away when extensions change.
+    def RegisterCallbacks(self):
+        try:
+            FBSystem().Scene.OnChange.Add(self.OnSceneChange)
+            FBApplication().OnFileNewCompleted.Add(self.OnFileChange)
+            FBApplication().OnFileOpenCompleted.Add(self.OnFileChange)
+            FBApplication().OnFileExit.Add(self.OnFileExit)
+            self.callbacksRegistered = True
+        except:
+            self.callbacksRegistered = False
+
+    # Removes the callbacks.
+    def UnregisterCallbacks(self):
+        if self.callbacksRegistered:
+            try:
+                FBSystem().Scene.OnChange.Remove(self.OnSceneChange)
+                FBApplication().OnFileNewCompleted.Remove(self.OnFileChange)
+                FBApplication().OnFileOpenCompleted.Remove(self.OnFileChange)
+                FBApplication().OnFileExit.Remove(self.OnFileExit)
+            except:
+                pass
+            self.callbacksRegistered = False
+        self.Clear()
+
+    # Scene change callback. Any change to a character extension, or any component being added or deleted, throws the index away.
+    def OnSceneChange(self, control, event):
+        if self.built:
+            if event.Type in [FBSceneChangeType.kFBSceneChangeAttach, FBSceneChangeType.kFBSceneChangeDetach, FBSceneChangeType.kFBSceneChangeDestroy]:
+                self.Clear()
+            elif isinstance(event.Component, FBCharacterExtension) or isinstance(event.ChildComponent, FBCharacterExtension):
+                self.Clear()
+
+    # File new and file open callback.
+    def OnFileChange(self, control, event):
+        self.Clear()
+
+    # File exit callback.
+    def OnFileExit(self, control, event):
+        self.UnregisterCallbacks()
+
+    # Builds the index if it hasn't been built, or if there are no callbacks to keep it up to date. Returns the index version, which goes up every time the index is built.
+    def Update(self):
+        if not self.callbacksRegistered:
+            self.RegisterCallbacks()
+        if not self.built or not self.callbacksRegistered:
+            self.Build()
+        return self.version
+
+    # Gets the index entry for a character.
+    def GetEntry(self, character):
+        for entry in self.characterEntries:
+            if entry[0] == character:
+                return entry
+
+    # Gets the character extensions attached to a character.
+    def GetExtensions(self, character):
+        self.Update()
+        entry = self.GetEntry(character)
+        return list(entry[1]) if entry else []
+
+    # Gets the objects in the character extensions attached to a character.
+    def GetExtensionObjects(self, character):
+        self.Update()
+        entry = self.GetEntry(character)
+        return list(entry[2]) if entry else []
+
+characterExtensionIndex = CharacterExtensionIndex()
+
+# Gets the extension objects for a list of characters at once. Returns a list of [character, extensionObjects] for each character.
+def GetCharacterExtensionObjectsForCharacters(characters):
+    characterExtensionIndex.Update()
+    return [[character, characterExtensionIndex.GetExtensionObjects(character)] for character in characters]
+
+class CharacterRigCache(object):
+    def __init__(self):
+        self.callbacksRegistered = False
+        self.descriptors = []
+
+    # Throws the descriptors away.
+    def Clear(self):
+        self.descriptors = []
+
+    # Registers the scene change and file callbacks that throw the descriptors away.
+    def RegisterCallbacks(self):
+        try:
+            FBSystem().Scene.OnChange.Add(self.OnSceneChange)
+            FBApplication().OnFileNewCompleted.Add(self.OnFileChange)
+            FBApplication().OnFileOpenCompleted.Add(self.OnFileChange)
+            FBApplication().OnFileExit.Add(self.OnFileExit)
+            self.callbacksRegistered = True
+        except:
+            self.callbacksRegistered = False
+
+    # Removes the callbacks.
+    def UnregisterCallbacks(self):
+        if self.callbacksRegistered:
+            try:
+                FBSystem().Scene.OnChange.Remove(self.OnSceneChange)
+                FBApplication().OnFileNewCompleted.Remove(self.OnFileChange)
+                FBApplication().OnFileOpenCompleted.Remove(self.OnFileChange)
+                FBApplication().OnFileExit.Remove(self.OnFileExit)
+            except:
+                pass
+            self.callbacksRegistered = False
+        self.Clear()
+
+    # Scene change callback.
+    def OnSceneChange(self, control, event):
+        if self.descriptors and event.Type in [FBSceneChangeType.kFBSceneChangeAttach, FBSceneChangeType.kFBSceneChangeDetach, FBSceneChangeType.kFBSceneChangeDestroy, FBSceneChangeType.kFBSceneChangeRenamed, FBSceneChangeType.kFBSceneChangeRenamedPrefix]:
+            self.Clear()
+
+    # File new and file open callback.
+    def OnFileChange(self, control, event):
+        self.Clear()
+
+    # File exit callback.
+    def OnFileExit(self, control, event):
+        self.UnregisterCallbacks()
+
+    # Gets the descriptor for a character, building it if there isn't a valid one.
+    def GetDescriptor(self, character):
+        if not self.callbacksRegistered:
+            self.RegisterCallbacks()
+            if not self.callbacksRegistered:
+                return CharacterRigDescriptor(character)
+        for descriptorIndex, descriptor in enumerate(self.descriptors):
+            if descriptor.character == character:
+                if descriptor.IsValid():
+                    return descriptor
+                del self.descriptors[descriptorIndex]
+                break
+        descriptor = CharacterRigDescriptor(character)
+        self.descriptors.append(descriptor)
+        return descriptor
+
+    # Gets the cached transform animation nodes for an object on the current take and layer, if it's part of a cached rig.
+    def GetTransformNodes(self, obj):
+        if not self.descriptors:
+            return None
+        take = FBSystem().CurrentTake
+        layerIndex = take.GetCurrentLayer()
+        for descriptor in self.descriptors:
+            nodes = descriptor.GetTransformNodes(obj, take, layerIndex)
+            if nodes is not None:
+                return nodes
+
+characterRigCache = CharacterRigCache()
+
+# Gets the rig descriptor for a character, or the current character if no character is given.
+def GetCharacterRigDescriptor(character = None):
+    if not character:
+        character = FBApplication().CurrentCharacter
+    if character:
+        return characterRigCache.GetDescriptor(character)
+
+# Gets the transform animation nodes for an object on the current take and layer, from the rig cache if the object is part of a cached rig.
+def GetCachedObjTransformNodes(obj):
+    nodes = None
+    try:
+        nodes = characterRigCache.GetTransformNodes(obj)
+    except:
+        pass
+    if nodes is None:
+        nodes = GetObjTransformNodes(obj)
+    return nodes
+
 '''
 The following functions are for dealing with selection.
 '''                    
@@ -552,15 +1409,24 @@ def SelectList(objList):
             pass
     FBEndChangeAllModels()
 
-# Deselects everything.
+# Deselects everything. Only the selection tracked by the scene component index is deselected, unless it's empty, in which case every scene component is checked, so a selection the index missed still gets deselected.
 def DeselectAll():
+    index = GetSceneComponentIndex()
+    entries = index.GetSelectedEntries()
     FBBeginChangeAllModels()
-    components = GetSceneComponents()
-    for obj in components:
+    for entry in entries:
+        obj = entry[0]
         try:
             obj.Selected = False
         except:
             pass
+    if not entries:
+        for obj in GetSceneComponents():
+            try:
+                obj.Selected = False
+            except:
+                pass
+        index.ClearSelection()
     FBEndChangeAllModels()
 
 '''
@@ -579,26 +1445,24 @@ def PlotOptions(allTakes = False):
     options.PlotLockedProperties = True
     return options
 
-# Plots all objects in a list.
-def FastPlotList(objectsToPlot, allTakes = False):
+# Plots a list of objects on a take, without any of the preparation that FastPlotList does.
+def PlotTakeOnObjects(take, objectsToPlot, allTakes = False):
+    try: # Added to support Mobu 2016 and earlier which didn't have plot options as an argument for this.
+        take.PlotTakeOnObjects(PlotOptions(allTakes), objectsToPlot)
+    except:
+        print("Regular plot method failed, switching to Motionbuilder 2016 plot method.")
+        take.PlotTakeOnObjects(FBTime(0,0,0,1),objectsToPlot)
+
+# Plots all objects in a list. With deferred set to True, and a plot scheduler open (see below), the plot is queued on the scheduler, and happens when the scheduler is flushed. Otherwise it happens straight away.
+def FastPlotList(objectsToPlot, allTakes = False, deferred = False):
     if isinstance(objectsToPlot, list):
         if len(objectsToPlot) > 0:
-            #objList = GetSelected()
-            DeselectAll()
-            take = FBSystem().CurrentTake
-            for obj in objectsToPlot:
-                try:
-                    obj.Translation.SetAnimated(True)
-                    obj.Rotation.SetAnimated(True)
-                except:
-                    pass
-            JiggleTimeline()
-            try: # Added to support Mobu 2016 and earlier which didn't have plot options as an argument for this.
-                take.PlotTakeOnObjects(PlotOptions(allTakes), objectsToPlot)
-            except:
-                print("Regular plot method failed, switching to Motionbuilder 2016 plot method.")
-                take.PlotTakeOnObjects(FBTime(0,0,0,1),objectsToPlot)
-            #SelectList(objList)
+            if deferred and plotSchedulerStack:
+                plotSchedulerStack[-1].Add(objectsToPlot, allTakes = allTakes)
+            else:
+                plotScheduler = PlotScheduler()
+                plotScheduler.Add(objectsToPlot, allTakes = allTakes)
+                plotScheduler.Flush()
         else:
             print("Plot failed: List of objects to plot is empty.")
     else:
@@ -612,23 +1476,233 @@ def FastPlotSelected(allTakes = False):
             objList = [objList]
         FastPlotList(objList, allTakes)
 
-# Plots all objects in a list, only on takes that are selected.
-def FastPlotListSelectedTakes(objectsToPlot):
+# Plots all objects in a list, only on takes that are selected. Returns the take batch report (see RunForTakes).
+def FastPlotListSelectedTakes(objectsToPlot, progressCallback = None, cancelCallback = None):
     selectedTakes = []
     for take in FBSystem().Scene.Takes:
         if take.Selected:
             selectedTakes.append(take)
-    for take in selectedTakes:
-        FBSystem().CurrentTake = take
-        FastPlotList(objectsToPlot)
+    return PlotListForTakes(objectsToPlot, selectedTakes, progressCallback, cancelCallback)
 
-# Plots a given character, or if no character is given, the current character.
-def PlotToCharacter(character = None):
+# Plots a given character, or if no character is given, the current character. See FastPlotList for deferred.
+def PlotToCharacter(character = None, deferred = False):
     if not character:
         character = FBApplication().CurrentCharacter
     if character:
         characterModels = GetCharacterEffectorsAndExtensions(character)
-        FastPlotList(characterModels)
+        FastPlotList(characterModels, deferred = deferred)
+
+'''
+The following are for plotting several lists of objects, on one or more takes, with as little overhead as possible. Plots added to a plot scheduler are queued, and the objects are merged per take. When the scheduler is flushed, the scene is deselected once, the timeline is jiggled once per take, and each take is plotted with one PlotTakeOnObjects call (plus one for objects plotted on all takes, which aren't plotted again on single takes).
+
+Use it as a context manager to queue the FastPlotList calls made inside the with block with deferred set to True, then flush them at the end:
+
+    with PlotScheduler() as plotScheduler:
+        for character in FBSystem().Scene.Characters:
+            PlotToCharacter(character, deferred = True)
+
+Deferring is opt in for each call, so code that plots and then deletes or changes what it plotted (e.g. temporary Story tracks) still plots straight away when it's called inside an open scheduler.
+
+If something goes wrong inside the with block, the queued plots are thrown away rather than plotted. The timings for each flush are kept in flushStats, as [objectCount, plotCalls, prepareSeconds, plotSeconds], and printed with PrintPlotSchedulerStats.
+'''
+
+# The open plot schedulers. Deferred FastPlotList calls queue on the last one.
+plotSchedulerStack = []
+
+class PlotScheduler(object):
+    def __init__(self):
+        self.takeQueue = []
+        self.allTakesQueue = []
+        self.flushStats = []
+
+    # Queues a list of objects to plot, on the given take (or the current take), or on all takes.
+    def Add(self, objectsToPlot, take = None, allTakes = False):
+        if not isinstance(objectsToPlot, list):
+            objectsToPlot = [objectsToPlot]
+        if allTakes:
+            self.allTakesQueue.extend(objectsToPlot)
+        else:
+            if not take:
+                take = FBSystem().CurrentTake
+            for entry in self.takeQueue:
+                if entry[0] == take:
+                    entry[1].extend(objectsToPlot)
+                    break
+            else:
+                self.takeQueue.append([take, list(objectsToPlot)])
+
+    # Gets the queued plots as a list of [take, objectsToPlot, allTakes], with duplicate objects removed.
+    def GetPlotGroups(self):
+        plotGroups = []
+        allTakesObjects = list(dict.fromkeys([obj for obj in self.allTakesQueue if obj]))
+        if allTakesObjects:
+            plotGroups.append([FBSystem().CurrentTake, allTakesObjects, True])
+        allTakesObjectSet = dict.fromkeys(allTakesObjects)
+        for take, objectsToPlot in self.takeQueue:
+            objectsToPlot = [obj for obj in dict.fromkeys(objectsToPlot) if obj and obj not in allTakesObjectSet]
+            if objectsToPlot:
+                plotGroups.append([take, objectsToPlot, False])
+        return plotGroups
+
+    # Throws away the queued plots.
+    def Clear(self):
+        self.takeQueue = []
+        self.allTakesQueue = []
+
+    # Plots everything that's queued, then clears the queue. Returns the stats for the flush.
+    def Flush(self):
+        plotGroups = self.GetPlotGroups()
+        self.Clear()
+        if not plotGroups:
+            return None
+        startTime = perfCounter()
+        currentTake = FBSystem().CurrentTake
+        DeselectAll()
+        objectCount = 0
+        for take, objectsToPlot, allTakes in plotGroups:
+            for obj in objectsToPlot:
+                try:
+                    obj.Translation.SetAnimated(True)
+                    obj.Rotation.SetAnimated(True)
+                except:
+                    pass
+            objectCount += len(objectsToPlot)
+        plotSeconds = 0.0
+        for take, objectsToPlot, allTakes in plotGroups:
+            if FBSystem().CurrentTake != take:
+                FBSystem().CurrentTake = take
+            JiggleTimeline()
+            plotStartTime = perfCounter()
+            PlotTakeOnObjects(take, objectsToPlot, allTakes)
+            plotSeconds += perfCounter() - plotStartTime
+        if FBSystem().CurrentTake != currentTake:
+            FBSystem().CurrentTake = currentTake
+        prepareSeconds = perfCounter() - startTime - plotSeconds
+        stats = [objectCount, len(plotGroups), prepareSeconds, plotSeconds]
+        self.flushStats.append(stats)
+        return stats
+
+    def __enter__(self):
+        plotSchedulerStack.append(self)
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        plotSchedulerStack.remove(self)
+        if excType:
+            self.Clear()
+        else:
+            self.Flush()
+        return False
+
+# Prints the timings for each flush of a plot scheduler.
+def PrintPlotSchedulerStats(plotScheduler):
+    for flushIndex, stats in enumerate(plotScheduler.flushStats):
+        print("Plot flush %s: %s objects, %s plot calls, %.3fs preparing, %.3fs plotting." % (flushIndex + 1, stats[0], stats[1], stats[2], stats[3]))
+
+'''
+The following are for running something on a batch of takes. RunForTakes goes through the takes once, in order, and a take that raises an error is reported rather than stopping the batch. progressCallback is called with (take, takesDone, takeCount, status) after each take, and cancelCallback is called before each take, with the batch stopping if it returns True. TakeBatchProgress shows the progress in a Motionbuilder progress bar, and cancels the batch if the user presses cancel on it.
+
+Each row of a take batch report is [take, status, error, seconds], where status is "Done", "Failed" or "Cancelled".
+'''
+
+# Runs takeFunction(take) for each take in a list. Makes each take the current take first, unless switchTakes is False, and sets the current take back at the end. Returns the take batch report.
+def RunForTakes(takes, takeFunction, progressCallback = None, cancelCallback = None, switchTakes = True):
+    currentTake = FBSystem().CurrentTake
+    report = []
+    cancelled = False
+    for take in takes:
+        if not cancelled and cancelCallback and cancelCallback():
+            cancelled = True
+        if cancelled:
+            report.append([take, "Cancelled", None, 0.0])
+            continue
+        startTime = perfCounter()
+        try:
+            if switchTakes and FBSystem().CurrentTake != take:
+                FBSystem().CurrentTake = take
+            takeFunction(take)
+            report.append([take, "Done", None, perfCounter() - startTime])
+        except Exception as error:
+            print("Take %s failed: %s" % (take.Name, error))
+            report.append([take, "Failed", str(error), perfCounter() - startTime])
+        if progressCallback:
+            progressCallback(take, len(report), len(takes), report[-1][1])
+    if FBSystem().CurrentTake != currentTake:
+        FBSystem().CurrentTake = currentTake
+    return report
+
+# Plots all objects in a list on a list of takes (or every take). When the list is every take in the scene, the objects are plotted on every take with one plot, without switching takes (progress is only reported once that plot is done, and the batch can't be cancelled part way through). Otherwise the takes are plotted one after the other, deselecting the scene only once. Returns the take batch report.
+def PlotListForTakes(objectsToPlot, takes = None, progressCallback = None, cancelCallback = None):
+    sceneTakes = list(FBSystem().Scene.Takes)
+    if takes is None:
+        takes = sceneTakes
+    if not isinstance(objectsToPlot, list):
+        objectsToPlot = [objectsToPlot]
+    objectsToPlot = [obj for obj in objectsToPlot if obj]
+    if not objectsToPlot:
+        print("Plot failed: List of objects to plot is empty.")
+        return []
+    if not takes:
+        print("Plot failed: No takes selected.")
+        return []
+    if len(takes) == len(sceneTakes) and all([take in takes for take in sceneTakes]) and not (cancelCallback and cancelCallback()):
+        startTime = perfCounter()
+        status = "Done"
+        error = None
+        try:
+            plotScheduler = PlotScheduler()
+            plotScheduler.Add(objectsToPlot, allTakes = True)
+            plotScheduler.Flush()
+        except Exception as plotError:
+            print("Plot on all takes failed: %s" % (plotError))
+            status = "Failed"
+            error = str(plotError)
+        seconds = (perfCounter() - startTime) / len(takes)
+        report = [[take, status, error, seconds] for take in takes]
+        if progressCallback:
+            for takeIndex, row in enumerate(report):
+                progressCallback(row[0], takeIndex + 1, len(report), row[1])
+        return report
+    DeselectAll()
+    for obj in objectsToPlot:
+        try:
+            obj.Translation.SetAnimated(True)
+            obj.Rotation.SetAnimated(True)
+        except:
+            pass
+    def PlotTake(take):
+        JiggleTimeline()
+        PlotTakeOnObjects(take, objectsToPlot)
+    return RunForTakes(takes, PlotTake, progressCallback, cancelCallback)
+
+class TakeBatchProgress(object):
+    def __init__(self, caption = "Processing takes"):
+        self.progressBar = FBProgress()
+        self.progressBar.Caption = caption
+        self.progressBar.Percent = 0
+
+    # Progress callback for RunForTakes.
+    def Progress(self, take, takesDone, takeCount, status):
+        self.progressBar.Text = "%s (%s of %s)" % (take.Name, takesDone, takeCount)
+        self.progressBar.Percent = int(100.0 * takesDone / max(1, takeCount))
+
+    # Cancel callback for RunForTakes.
+    def Cancel(self):
+        return self.progressBar.UserRequestCancell()
+
+    # Closes the progress bar.
+    def Close(self):
+        self.progressBar.FBDelete()
+
+# Prints a summary of a take batch report.
+def PrintTakeBatchReport(report):
+    for status in ["Done", "Failed", "Cancelled"]:
+        rows = [row for row in report if row[1] == status]
+        if rows:
+            print("%s: %s takes (%.2fs)" % (status, len(rows), sum([row[3] for row in rows])))
+            if status == "Failed":
+                for row in rows:
+                    print("    %s: %s" % (row[0].Name, row[2]))
 
 '''
 The following function is for organizing lists
@@ -840,6 +1914,46 @@ def SetLayerWeight(weight = 100.0, layerName = None):
         if layer.Name != "BaseAnimation":
             layer.Weight = weight
 
+'''
+The following functions are for getting transform fcurves from layers. Switching layers is slow, so these switch to each layer once and get the fcurves for every object while they're on it.
+'''
+
+# Gets the transform nodes for an object.
+def GetObjTransformNodes(obj):
+    transProp = obj.PropertyList.Find("Lcl Translation")
+    rotProp = obj.PropertyList.Find("Lcl Rotation")
+    if not transProp:
+        transProp.SetAnimated(True)
+        transProp = obj.PropertyList.Find("Lcl Translation")
+    if not rotProp:
+        rotProp.SetAnimated(True)
+        rotProp = obj.PropertyList.Find("Lcl Rotation")
+    transNodes = transProp.GetAnimationNode().Nodes
+    rotNodes = rotProp.GetAnimationNode().Nodes
+    nodes = list(transNodes) + list(rotNodes)
+    return nodes
+
+# Gets the translation and rotation fcurves for an object on the current layer.
+def GetObjTransformFCurves(obj):
+    try:
+        return [node.FCurve for node in GetCachedObjTransformNodes(obj)]
+    except:
+        return []
+
+# Gets the transform fcurves for every object in a list, for each given layer index. Only switches layer once per layer, then sets the current layer back. Returns a dictionary of layer index to a list of fcurve lists, in the same order as objList.
+def GetLayerFCurveTable(objList, layerIndices):
+    if not isinstance(objList, list):
+        objList = [objList]
+    take = FBSystem().CurrentTake
+    currentLayerIndex = take.GetCurrentLayer()
+    fcurveTable = {}
+    for layerIndex in layerIndices:
+        if layerIndex not in fcurveTable:
+            take.SetCurrentLayer(layerIndex)
+            fcurveTable[layerIndex] = [GetObjTransformFCurves(obj) for obj in objList]
+    take.SetCurrentLayer(currentLayerIndex)
+    return fcurveTable
+
 '''
 The following functions are for keying objects.
 '''
@@ -972,7 +2086,11 @@ def AddNamespaceToSelected(namespaceToAdd):
 # Replace a namespace in the scene. Replaces on all objects with that namespace.
 def ReplaceNamespace(oldNamespace, newNamespace, objList = None):
     if not objList:
-        objList = GetSceneComponents()
+        if oldNamespace:
+            namespacePrefix = oldNamespace.rstrip(":") + ":"
+            objList = list(IterSceneComponents(predicate = lambda obj: isinstance(obj, FBNamespace) or namespacePrefix in obj.LongName))
+        else:
+            objList = GetSceneComponents()
     if not isinstance(objList, list) and not isinstance(objList, FBPropertyListComponent):
         objList = [objList]
     for obj in objList:
@@ -1370,23 +2488,21 @@ def ConnectBoxNodesByName(constraint, outputBoxName, inputBoxName, outputNodeNam
     ConnectBoxNodes(outputBox, inputBox, outputNodeName, inputNodeName)
 
 '''
-The following functions are for basic math operations.
+The following functions are for basic math operations, one vector at a time. For lots of vectors at once, VectorMath.py has array versions of these (NumPy is required for those).
 '''
 
 # Finds the distance between two positions.
 def GetDistance(pos1, pos2):
-    x1 = pos1[0]
-    y1 = pos1[1]
-    z1 = pos1[2]
-    x2 = pos2[0]
-    y2 = pos2[1]
-    z2 = pos2[2]
-    distance = math.sqrt( pow((x1-x2),2) + pow((y1-y2),2) + pow((z1-z2),2))
-    return distance
+    x = pos1[0] - pos2[0]
+    y = pos1[1] - pos2[1]
+    z = pos1[2] - pos2[2]
+    return math.sqrt(x*x + y*y + z*z)
 
 # Get dot product
 def DotProduct(v1, v2):
-    return sum((a*b) for a, b in zip(v1, v2))
+    if len(v1) == 3 and len(v2) == 3:
+        return v1[0]*v2[0] + v1[1]*v2[1] + v1[2]*v2[2]
+    return sum([a*b for a, b in zip(v1, v2)])
 
 # Get length
 def Length(v):
@@ -1395,8 +2511,8 @@ def Length(v):
 # Get angle between two vectors.
 def GetAngleBetweenVectors(v1, v2):
     try:
-        radian = math.acos(DotProduct(v1, v2) / (Length(v1) * Length(v2)))
-        angle = radian*(180/math.pi)
+        cosine = DotProduct(v1, v2) / (Length(v1) * Length(v2))
+        angle = math.degrees(math.acos(min(1.0, max(-1.0, cosine))))
     except:
         angle = 0
     return angle
@@ -1446,19 +2562,3 @@ def PrintTimeStampList(timeStampList):
         percentage = (100 / totalSeconds) * timeStamp[2].total_seconds()
         print("Name: %s%sTime: %s%sDelta: %s%sPercent: %s" % (timeStamp[0], GetTitleSpace(str(timeStamp[0]), bufferAmount), timeStamp[1].time(), GetTitleSpace(str(timeStamp[1].time()), 20), timeStamp[2], GetTitleSpace(str(timeStamp[2]), 18), percentage))
     print("Total Time: %s" % (totalTime))
-    
-'''
-Function for getting the distance between objects.
-'''
-
-# Gets the distance between two given objects.
-def GetDistance(pos1, pos2):
-    from math import sqrt
-    x1 = pos1[0]
-    y1 = pos1[1]
-    z1 = pos1[2]
-    x2 = pos2[0]
-    y2 = pos2[1]
-    z2 = pos2[2]
-    distance = sqrt( pow((x1-x2),2) + pow((y1-y2),2) + pow((z1-z2),2))
-    return distance
@@ -0,0 +1,146 @@
+'''
+Array versions of the MobuCoreLibrary vector math functions, for working on lots of vectors at once. Every function takes N x 3 arrays, lists of FBVector3d (or any other sequence of 3 numbers), or a single vector, and returns arrays. The scalar functions in MobuCoreLibrary (GetDistance, DotProduct, Length, GetAngleBetweenVectors and GetWorldSpaceAngleToObj) give the same results for one vector at a time.
+
+Angles are in degrees. Rotations are Euler angles in degrees, with Motionbuilder's default XYZ rotation order (X is applied first, then Y, then Z).
+
+NumPy is required for this script. It doesn't import pyfbsdk.
+____________________________________________________________________
+
+This script was written by Dan Lowe as part of the MobuCore package.  You can reach Dan Lowe on Twitter at https://twitter.com/danlowlows (at time of writing, direct messages are open).
+
+MobuCore is made available under the following license terms:
+
+MIT License
+
+Copyright (c) 2023 Dan Lowe
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import numpy as np
+
+'''
+The following function is for getting vectors into an array.
+'''
+
+# Gets an N x 3 float array from an array, a list of vectors (e.g. FBVector3d) or a single vector. An empty list gives a 0 x 3 array.
+def AsVectorArray(vectors):
+    if len(vectors) == 0:
+        return np.empty((0, 3), dtype = np.float64)
+    try:
+        array = np.asarray(vectors, dtype = np.float64)
+    except (TypeError, ValueError):
+        array = None
+    if array is None or array.dtype == object or array.shape[-1:] != (3,):
+        if len(vectors) == 3 and not hasattr(vectors[0], "__len__"):
+            vectors = [vectors]
+        array = np.array([[vector[0], vector[1], vector[2]] for vector in vectors], dtype = np.float64)
+    return np.atleast_2d(array)
+
+'''
+The following functions are for distances, dot products and lengths. Pairs of arrays are matched row by row (a single vector is matched with every row).
+'''
+
+# Gets the distance between each pair of positions.
+def GetDistances(positions1, positions2):
+    return np.linalg.norm(AsVectorArray(positions1) - AsVectorArray(positions2), axis = 1)
+
+# Gets the distance from every position in one list to every position in another, as an N x M array.
+def GetPairwiseDistances(positions1, positions2):
+    positions1 = AsVectorArray(positions1)
+    positions2 = AsVectorArray(positions2)
+    return np.linalg.norm(positions1[:, None, :] - positions2[None, :, :], axis = 2)
+
+# Gets the dot product of each pair of vectors.
+def GetDotProducts(vectors1, vectors2):
+    return np.einsum("ij,ij->i", *np.broadcast_arrays(AsVectorArray(vectors1), AsVectorArray(vectors2)))
+
+# Gets the length of each vector.
+def GetLengths(vectors):
+    return np.linalg.norm(AsVectorArray(vectors), axis = 1)
+
+# Gets each vector scaled to a length of 1. Zero length vectors stay zero.
+def NormalizeVectors(vectors):
+    vectors = AsVectorArray(vectors)
+    lengths = np.linalg.norm(vectors, axis = 1, keepdims = True)
+    return np.divide(vectors, lengths, out = np.zeros_like(vectors), where = lengths > 0)
+
+'''
+The following functions are for angles.
+'''
+
+# Gets the angle between each pair of vectors, from 0 to 180. Pairs with a zero length vector get 0.
+def GetAnglesBetweenVectors(vectors1, vectors2):
+    vectors1, vectors2 = np.broadcast_arrays(AsVectorArray(vectors1), AsVectorArray(vectors2))
+    lengths = np.linalg.norm(vectors1, axis = 1) * np.linalg.norm(vectors2, axis = 1)
+    cosines = np.divide(np.einsum("ij,ij->i", vectors1, vectors2), lengths, out = np.ones_like(lengths), where = lengths > 0)
+    return np.degrees(np.arccos(np.clip(cosines, -1.0, 1.0)))
+
+# Gets the signed angle from each vector to the matching vector, from -180 to 180, where positive is counter clockwise looking down the axis (Y up by default).
+def GetSignedAngles(vectors1, vectors2, axis = (0, 1, 0)):
+    vectors1, vectors2 = np.broadcast_arrays(AsVectorArray(vectors1), AsVectorArray(vectors2))
+    angles = GetAnglesBetweenVectors(vectors1, vectors2)
+    signs = np.einsum("ij,ij->i", np.cross(vectors1, vectors2), np.broadcast_to(AsVectorArray(axis), vectors1.shape))
+    return np.where(signs < 0, -angles, angles)
+
+# Gets the angle from the world origin to each position, measured from +Z, negative when X is negative. The array version of GetWorldSpaceAngleToObj.
+def GetWorldSpaceAngles(positions):
+    positions = AsVectorArray(positions)
+    angles = GetAnglesBetweenVectors([0, 0, 100000], positions)
+    return np.where(positions[:, 0] < 0, -angles, angles)
+
+'''
+The following functions are for converting rotations.
+'''
+
+# Gets a 3 x 3 rotation matrix for each XYZ Euler rotation, as an N x 3 x 3 array.
+def EulerToMatrices(rotations):
+    radians = np.radians(AsVectorArray(rotations))
+    cosX, cosY, cosZ = np.cos(radians).T
+    sinX, sinY, sinZ = np.sin(radians).T
+    matrices = np.empty((len(radians), 3, 3))
+    matrices[:, 0, 0] = cosY * cosZ
+    matrices[:, 0, 1] = sinX * sinY * cosZ - cosX * sinZ
+    matrices[:, 0, 2] = cosX * sinY * cosZ + sinX * sinZ
+    matrices[:, 1, 0] = cosY * sinZ
+    matrices[:, 1, 1] = sinX * sinY * sinZ + cosX * cosZ
+    matrices[:, 1, 2] = cosX * sinY * sinZ - sinX * cosZ
+    matrices[:, 2, 0] = -sinY
+    matrices[:, 2, 1] = sinX * cosY
+    matrices[:, 2, 2] = cosX * cosY
+    return matrices
+
+# Gets the XYZ Euler rotation for each 3 x 3 rotation matrix. At gimbal lock (Y at +/-90), X is set to 0.
+def MatricesToEuler(matrices):
+    matrices = np.asarray(matrices, dtype = np.float64).reshape(-1, 3, 3)
+    sinY = np.clip(-matrices[:, 2, 0], -1.0, 1.0)
+    rotations = np.empty((len(matrices), 3))
+    rotations[:, 1] = np.arcsin(sinY)
+    gimbalLocked = np.abs(sinY) > 1.0 - 1e-9
+    rotations[:, 0] = np.where(gimbalLocked, 0.0, np.arctan2(matrices[:, 2, 1], matrices[:, 2, 2]))
+    rotations[:, 2] = np.where(gimbalLocked, np.arctan2(-matrices[:, 0, 1], matrices[:, 1, 1]), np.arctan2(matrices[:, 1, 0], matrices[:, 0, 0]))
+    return np.degrees(rotations)
+
+# Rotates each vector by the matching XYZ Euler rotation (a single vector or rotation is used for every row).
+def RotateVectors(vectors, rotations):
+    return np.matmul(EulerToMatrices(rotations), AsVectorArray(vectors)[:, :, None])[:, :, 0]
+
+# Gets the direction each XYZ Euler rotation points a forward vector (+Z by default).
+def GetDirectionsFromEuler(rotations, forward = (0, 0, 1)):
+    return RotateVectors(forward, rotations)
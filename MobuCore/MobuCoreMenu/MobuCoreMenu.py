@@ -33,13 +33,35 @@ SOFTWARE.
 
 # Import of all the different functions from different files.
 from pyfbsdk import FBMenuManager, FBMessageBox
-from MobuCore.MobuCoreTools.AdjustmentBlend.AdjustmentBlend import AdjustmentBlendCharacter
-from MobuCore.MobuCoreTools.StoryFunctions.StoryFunctions import CopySelectedStoryClipsToTracks, CopySelectedStoryClipsToTakes, CenterSelectedClips
+# Adjustment Blend needs NumPy. If it can't be imported, the rest of the menu still loads, without the Adjustment Blend options.
+try:
+    from MobuCore.MobuCoreTools.AdjustmentBlend.AdjustmentBlend import AdjustmentBlendCharacter, AdjustmentBlendTakes, AdjustmentBlendCharacterChangedPoses, AdjustmentBlendCharacterLayers, PreviewAdjustmentBlendSelected, CommitAdjustmentBlendPreview, DiscardAdjustmentBlendPreview
+    adjustmentBlendImportError = None
+except ImportError as error:
+    adjustmentBlendImportError = error
+from MobuCore.MobuCoreTools.StoryFunctions.StoryFunctions import CopySelectedStoryClipsToTracks, CopySelectedStoryClipsToTakes, CenterSelectedClips, ResumeStoryClipsToTakes
+try:
+    from MobuCore.MobuCoreTools.Coverage.CoverageIndexer import IndexCurrentSceneCoverage
+    coverageImportError = None
+except ImportError as error:
+    coverageImportError = error
 
 # Checks against the given event name and if it finds it, runs the associated function.
 def OnMenuClick(eventName):
     if eventName == "Adjustment Blend":
         AdjustmentBlendCharacter()
+    elif eventName == "Adjustment Blend - Selected Takes":
+        AdjustmentBlendTakes(workerCount = 1)
+    elif eventName == "Adjustment Blend - Changed Poses Only":
+        AdjustmentBlendCharacterChangedPoses()
+    elif eventName == "Adjustment Blend - Selected Layers":
+        AdjustmentBlendCharacterLayers()
+    elif eventName == "Adjustment Blend - Preview Selected":
+        PreviewAdjustmentBlendSelected()
+    elif eventName == "Adjustment Blend - Commit Preview":
+        CommitAdjustmentBlendPreview()
+    elif eventName == "Adjustment Blend - Discard Preview":
+        DiscardAdjustmentBlendPreview()
     elif eventName == "Center Selected Story Clips":
         CenterSelectedClips()
     elif eventName == "Copy Selected Story Clips To Tracks":
@@ -48,6 +70,10 @@ def OnMenuClick(eventName):
         CopySelectedStoryClipsToTakes(False)
     elif eventName == "Copy Selected Story Clips To Takes - Centered":
         CopySelectedStoryClipsToTakes()
+    elif eventName == "Resume Story Clips To Takes":
+        ResumeStoryClipsToTakes()
+    elif eventName == "Index Scene Coverage":
+        IndexCurrentSceneCoverage()
     else:
         FBMessageBox("Error...", "Menu Error: This option hasn't been set up yet.", "OK")
 
@@ -63,12 +89,27 @@ def LoadMenu():
     menuManager = FBMenuManager()
     
     menuManager.InsertLast( None, mainMenuName )
-    menuManager.InsertLast( mainMenuName, "Adjustment Blend" )
-    menuManager.InsertLast( mainMenuName, "" )
+    if adjustmentBlendImportError is None:
+        menuManager.InsertLast( mainMenuName, "Adjustment Blend" )
+        menuManager.InsertLast( mainMenuName, "Adjustment Blend - Selected Takes" )
+        menuManager.InsertLast( mainMenuName, "Adjustment Blend - Changed Poses Only" )
+        menuManager.InsertLast( mainMenuName, "Adjustment Blend - Selected Layers" )
+        menuManager.InsertLast( mainMenuName, "Adjustment Blend - Preview Selected" )
+        menuManager.InsertLast( mainMenuName, "Adjustment Blend - Commit Preview" )
+        menuManager.InsertLast( mainMenuName, "Adjustment Blend - Discard Preview" )
+        menuManager.InsertLast( mainMenuName, "" )
+    else:
+        print("MobuCore: Adjustment Blend options left out of the menu, as it couldn't be imported (%s). Adjustment Blend needs NumPy." % (adjustmentBlendImportError))
     menuManager.InsertLast( mainMenuName, "Center Selected Story Clips" )
     menuManager.InsertLast( mainMenuName, "Copy Selected Story Clips To Tracks" )
     menuManager.InsertLast( mainMenuName, "Copy Selected Story Clips To Takes" )
     menuManager.InsertLast( mainMenuName, "Copy Selected Story Clips To Takes - Centered" )
+    menuManager.InsertLast( mainMenuName, "Resume Story Clips To Takes" )
+    if coverageImportError is None:
+        menuManager.InsertLast( mainMenuName, "" )
+        menuManager.InsertLast( mainMenuName, "Index Scene Coverage" )
+    else:
+        print("MobuCore: Index Scene Coverage left out of the menu, as it couldn't be imported (%s). Coverage indexing needs NumPy." % (coverageImportError))
     
     # Example menu structure for future menu items...
     # Line break:                   menuManager.InsertLast( mainMenuName, "" )
@@ -3,7 +3,7 @@ Adjustment Blending is a method for adjusting additive layer interpolation betwe
 
 This helps to maintain the existing energy of the base layer motion, and helps to maintain contact points. For more information, see this talk from GDC 2016: https://youtu.be/eeWBlMJHR14?t=518
 
-MobuCoreLibrary functions are required for this script.
+MobuCoreLibrary functions and NumPy are required for this script. The blend math itself lives in AdjustmentBlendMath.py.
 ____________________________________________________________________
 
 This script was written by Dan Lowe as part of the MobuCore package.  You can reach Dan Lowe on Twitter at https://twitter.com/danlowlows (at time of writing, direct messages are open).
@@ -33,8 +33,13 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 '''
 
-from pyfbsdk import FBSystem, FBApplication, FBTime, FBMessageBox
-from MobuCore.MobuCoreLibrary.MobuCoreLibrary import GetCharacterEffectorsAndExtensions
+from pyfbsdk import FBSystem, FBApplication, FBTime, FBMessageBox, FBBeginChangeAllModels, FBEndChangeAllModels
+import json
+import numpy as np
+from MobuCore.MobuCoreLibrary.MobuCoreLibrary import perfCounter, GetCharacterEffectorsAndExtensions, GetObjTransformNodes, GetObjTransformFCurves, GetLayerFCurveTable, CreateCustomProperty, CreateNewLayer, GetSelected
+from MobuCore.MobuCoreTools.AdjustmentBlend.AdjustmentBlendMath import AdjustmentBlendChannels, GetChannelSampleFrames, GetKeyPairFingerprints, GetChangedKeyPairRuns
+from MobuCore.MobuCoreTools.AdjustmentBlend.AdjustmentBlendBatch import RunAdjustmentBlendJobs
+from MobuCore.MobuCoreTools.AdjustmentBlend.AdjustmentBlendFile import WriteChannelFile, IterChannelFile
 
 # Groups pairs of keys from the layer fcurve, between which it will run an independent adjustment blend (allows adjustment blend to work with multiple key poses on the layer).
 def GetKeyPairsFromFCurve(keys):
@@ -47,28 +52,10 @@ def GetKeyPairsFromFCurve(keys):
         keyPairsList.append([startKeyTime, stopKeyTime, startKeyValue, stopKeyValue])
     return keyPairsList
 
-# Gets the transform nodes for an object.
-def GetObjTransformNodes(obj):
-    transProp = obj.PropertyList.Find("Lcl Translation")
-    rotProp = obj.PropertyList.Find("Lcl Rotation")
-    if not transProp:
-        transProp.SetAnimated(True)
-        transProp = obj.PropertyList.Find("Lcl Translation")
-    if not rotProp:
-        rotProp.SetAnimated(True)
-        rotProp = obj.PropertyList.Find("Lcl Rotation")
-    transNodes = transProp.GetAnimationNode().Nodes
-    rotNodes = rotProp.GetAnimationNode().Nodes
-    nodes = list(transNodes) + list(rotNodes)
-    return nodes
-
 # Gets the fcurves for an object from a specified layer.
 def GetObjectFCurvesForLayer(obj, layerIndex):
     FBSystem().CurrentTake.SetCurrentLayer(layerIndex)
-    try:
-        return [node.FCurve for node in GetObjTransformNodes(obj)]
-    except:
-        return []
+    return GetObjTransformFCurves(obj)
 
 # Reads the per frame values from an fcurve (doesn't require keys to be on those frames).
 def EvaluateFCurveForKeyPairTimespan(fcurve, startTime, stopTime):
@@ -92,47 +79,537 @@ def GetPercentageOfChangeValues(spanValues):
             percentageValues.append([spanValues[i][0], (100.0 / totalBaseLayerChange) * changeValues[i]])
     return percentageValues, totalBaseLayerChange
 
-# The main adjustment blend function that does everything else. This is what you'd run if you were just adjustment blending a single object.
-def AdjustmentBlendObject(obj):
+# Gets the number of FBTime ticks in one frame at the current frame rate. Frames are passed around as floats, and turned back into ticks with this, so keys between frames keep their exact time.
+def GetTicksPerFrame():
+    return FBTime(0,0,0,1).Get()
+
+# Gets the FBTime ticks for a list of float frames.
+def GetFrameTicks(frames):
+    return np.rint(np.asarray(frames, dtype=np.float64) * GetTicksPerFrame()).astype(np.int64).tolist()
+
+# Samples an fcurve on a list of float frames, into a float64 array. Reuses one FBTime for the whole curve, so there's only one Evaluate call per frame.
+def SampleFCurve(fcurve, frames):
+    samples = np.empty(len(frames), dtype=np.float64)
+    fbTime = FBTime()
+    for i, ticks in enumerate(GetFrameTicks(frames)):
+        fbTime.Set(ticks)
+        samples[i] = fcurve.Evaluate(fbTime)
+    return samples
+
+# Gets the frames (as floats, so keys between frames aren't moved) and values of the keys on an fcurve.
+def GetFCurveKeyFramesAndValues(fcurve):
+    keys = fcurve.Keys
+    ticksPerFrame = float(GetTicksPerFrame())
+    keyFrames = [key.Time.Get() / ticksPerFrame for key in keys]
+    keyValues = [key.Value for key in keys]
+    return keyFrames, keyValues
+
+# Keys a list of float frames and values onto an fcurve in one edit, rather than updating the curve for each key. Returns the number of keys written.
+def KeyFCurveFrames(fcurve, frames, values):
+    keyCount = len(frames)
+    if keyCount > 0:
+        keyTime = FBTime()
+        fcurve.EditBegin(keyCount)
+        for ticks, value in zip(GetFrameTicks(frames), values):
+            keyTime.Set(ticks)
+            fcurve.KeyAdd(keyTime, value)
+        fcurve.EditEnd(keyCount)
+    return keyCount
+
+# Keys the blended values from AdjustmentBlendChannels onto the layer fcurves. Returns the number of keys written for each channel.
+def KeyAdjustmentBlendResults(channelList, channelFCurves, results):
+    keyCounts = []
+    for channel, fcurve, result in zip(channelList, channelFCurves, results):
+        blendedValues, writeMask = result
+        frameIndices = np.flatnonzero(writeMask)
+        frames = GetChannelSampleFrames(channel[1])[frameIndices].tolist()
+        values = blendedValues[frameIndices].tolist()
+        keyCounts.append(KeyFCurveFrames(fcurve, frames, values))
+    return keyCounts
+
+# Gets the adjustment blend channels for a list of objects on one or more additive layers, with one layer switch per layer. Each base layer curve is sampled once, on the sample frames of all of the layers, and each layer's channel picks its own frames out of those samples. Returns the channel list, plus the layer fcurve and object for each channel.
+def GetAdjustmentBlendChannelsForLayers(objList, poseLayerIndices, baseLayerIndex = 0):
+    fcurveTable = GetLayerFCurveTable(objList, list(poseLayerIndices) + [baseLayerIndex])
+    channelList = []
+    channelFCurves = []
+    channelObjs = []
+    for i, obj in enumerate(objList):
+        baseLayerFCurves = fcurveTable[baseLayerIndex][i]
+        for channelIndex in range(len(baseLayerFCurves)):
+            layerKeys = []
+            for poseLayerIndex in poseLayerIndices:
+                poseLayerFCurves = fcurveTable[poseLayerIndex][i]
+                if channelIndex < len(poseLayerFCurves):
+                    keyFrames, keyValues = GetFCurveKeyFramesAndValues(poseLayerFCurves[channelIndex])
+                    if len(keyFrames) > 1:
+                        layerKeys.append([poseLayerFCurves[channelIndex], keyFrames, keyValues])
+            if layerKeys:
+                layerSampleFrames = [GetChannelSampleFrames(keys[1]) for keys in layerKeys]
+                sampleFrames = np.unique(np.concatenate(layerSampleFrames))
+                baseSamples = SampleFCurve(baseLayerFCurves[channelIndex], sampleFrames)
+                for keys, channelSampleFrames in zip(layerKeys, layerSampleFrames):
+                    poseFCurve, keyFrames, keyValues = keys
+                    channelList.append((baseSamples[np.searchsorted(sampleFrames, channelSampleFrames)], keyFrames, keyValues))
+                    channelFCurves.append(poseFCurve)
+                    channelObjs.append(obj)
+    return channelList, channelFCurves, channelObjs
+
+# Gets the adjustment blend channels for a list of objects, with one layer switch per layer. Returns the channel list, plus the layer fcurve and object for each channel.
+def GetAdjustmentBlendChannelsForObjects(objList, poseLayerIndex, baseLayerIndex = 0):
+    return GetAdjustmentBlendChannelsForLayers(objList, [poseLayerIndex], baseLayerIndex)
+
+# Keys adjustment blend results for a list of objects inside a single model change block. Returns a list of [obj, keysWritten] for each object.
+def KeyAdjustmentBlendObjectResults(objList, channelList, channelFCurves, channelObjs, results):
+    keysWritten = dict.fromkeys(objList, 0)
+    if channelList:
+        FBBeginChangeAllModels()
+        try:
+            keyCounts = KeyAdjustmentBlendResults(channelList, channelFCurves, results)
+        finally:
+            FBEndChangeAllModels()
+        for obj, keyCount in zip(channelObjs, keyCounts):
+            keysWritten[obj] += keyCount
+    return [[obj, keyCount] for obj, keyCount in keysWritten.items()]
+
+# Adjustment blends the channels for a list of objects in one go, and keys the results inside a single model change block. The pose keys and key pair fingerprints are stored on the take afterwards, and when incremental is True, only key pairs that have changed since the last run are blended (see below). Returns a list of [obj, keysWritten] for each object.
+def AdjustmentBlendObjectList(objList, poseLayerIndex, baseLayerIndex = 0, incremental = False):
+    objList = [obj for obj in objList if obj]
+    take = FBSystem().CurrentTake
+    fingerprints = LoadAdjustmentBlendFingerprints(take)
+    layerFingerprints = fingerprints.setdefault(take.GetLayer(poseLayerIndex).Name, {})
+    channelList, channelFCurves, channelObjs, channelRecords, staleChannelNames = GetIncrementalAdjustmentBlendChannels(objList, poseLayerIndex, baseLayerIndex, layerFingerprints, incremental)
+    results = AdjustmentBlendChannels(channelList) if channelList else []
+    keysWritten = KeyAdjustmentBlendObjectResults(objList, channelList, channelFCurves, channelObjs, results)
+    UpdateAdjustmentBlendFingerprints(layerFingerprints, channelRecords)
+    SaveAdjustmentBlendFingerprints(take, fingerprints)
+    if staleChannelNames:
+        for channelName in staleChannelNames:
+            print("Adjustment blend skipped channel %s: Keys have been added or removed since the last adjustment blend." % (channelName))
+        FBMessageBox("Warning...", "%s channels had keys added or removed since they were last adjustment blended (or were blended by another adjustment blend option), so their pose keys can't be told apart from the blended keys. They were skipped. Run a full Adjustment Blend to blend them." % (len(staleChannelNames)), "OK")
+    return keysWritten
+
+# Gets the index of the top most additive layer, which is the layer adjustment blending works on. The adjustment blend preview layer (see below) is skipped. Returns 0 if there's no additive layer.
+def GetPoseLayerIndex(take = None):
+    if not take:
+        take = FBSystem().CurrentTake
+    for layerIndex in range(take.GetLayerCount()-1, 0, -1):
+        if take.GetLayer(layerIndex).Name != ADJUSTMENT_BLEND_PREVIEW_LAYER_NAME:
+            return layerIndex
+    return 0
+
+# The main adjustment blend function that does everything else. This is what you'd run if you were just adjustment blending a single object. Returns the number of keys written.
+def AdjustmentBlendObject(obj, incremental = False):
     take = FBSystem().CurrentTake
-    if take.GetLayerCount() > 1:
-        poseLayerFCurves = GetObjectFCurvesForLayer(obj, take.GetLayerCount()-1)
-        baseLayerFCurves = GetObjectFCurvesForLayer(obj, 0)
-        for i in range(len(poseLayerFCurves)):
-            poseFCurve = poseLayerFCurves[i]
-            keys = poseFCurve.Keys
-            if len(keys) > 1:
-                keyPairsList = GetKeyPairsFromFCurve(keys)
-                for keyPair in keyPairsList:
-                    startTime = keyPair[0]
-                    stopTime = keyPair[1]
-                    startValue = keyPair[2]
-                    stopValue = keyPair[3]
-                    spanValues = EvaluateFCurveForKeyPairTimespan(baseLayerFCurves[i], startTime, stopTime)
-                    percentageValues, totalBaseLayerChange = GetPercentageOfChangeValues(spanValues)
-                    totalPoseLayerChange = abs(stopValue - startValue)
-                    previousValue = startValue
-                    for value in percentageValues:
-                        valueDelta = (totalPoseLayerChange / 100.0) * value[1]
-                        if stopValue > startValue:
-                            currentValue = previousValue + valueDelta
-                        else:
-                            currentValue = previousValue - valueDelta
-                        poseLayerFCurves[i].KeyAdd(value[0], currentValue)
-                        previousValue = currentValue
-
-# The main adjustment blending function for running it on an entire character.
-def AdjustmentBlendCharacter(character = None):
+    keysWritten = 0
+    poseLayerIndex = GetPoseLayerIndex(take)
+    if poseLayerIndex > 0:
+        keysWritten = AdjustmentBlendObjectList([obj], poseLayerIndex, 0, incremental)[0][1]
+    return keysWritten
+
+# The main adjustment blending function for running it on an entire character. Returns a list of [obj, keysWritten] for each character object.
+def AdjustmentBlendCharacter(character = None, incremental = False):
     if not character:
         character = FBApplication().CurrentCharacter
     if character:
         take = FBSystem().CurrentTake
-        if take.GetLayerCount() > 1:
+        poseLayerIndex = GetPoseLayerIndex(take)
+        if poseLayerIndex > 0:
             characterObjs = GetCharacterEffectorsAndExtensions(character)
-            for obj in characterObjs:
-                if obj:
-                    AdjustmentBlendObject(obj)
+            keysWritten = AdjustmentBlendObjectList(characterObjs, poseLayerIndex, 0, incremental)
+            print("Adjustment blend wrote %s keys on %s objects." % (sum([info[1] for info in keysWritten]), len(keysWritten)))
+            return keysWritten
         else:
             FBMessageBox("Error...", "No additive layer found. Adjustment blending affects interpolation between keys on the the top most additive layer.", "OK")
     else:
         FBMessageBox("Error...", "No additive layer found. Adjustment blending affects interpolation between keys on the top most additive layer.", "OK")
+
+'''
+The following functions are for adjustment blending several additive layers at once. Each layer is blended against the base layer on its own, but the base layer is only read once for all of them.
+'''
+
+# Gets the indices of the additive layers that are selected, or the top most additive layer if none are selected.
+def GetSelectedAdditiveLayerIndices(take = None):
+    if not take:
+        take = FBSystem().CurrentTake
+    layerIndices = []
+    for i in range(1, take.GetLayerCount()):
+        layer = take.GetLayer(i)
+        if layer.IsSelected() and layer.Name != ADJUSTMENT_BLEND_PREVIEW_LAYER_NAME:
+            layerIndices.append(i)
+    if not layerIndices and GetPoseLayerIndex(take) > 0:
+        layerIndices = [GetPoseLayerIndex(take)]
+    return layerIndices
+
+# Adjustment blends a character on several additive layers. By default this is the selected layers (or the top most additive layer, if none are selected). Returns a list of [obj, keysWritten] for each character object.
+def AdjustmentBlendCharacterLayers(character = None, layerIndices = None):
+    if not character:
+        character = FBApplication().CurrentCharacter
+    if character:
+        take = FBSystem().CurrentTake
+        if not layerIndices:
+            layerIndices = GetSelectedAdditiveLayerIndices(take)
+        layerIndices = [layerIndex for layerIndex in layerIndices if layerIndex > 0]
+        if layerIndices:
+            objList = [obj for obj in GetCharacterEffectorsAndExtensions(character) if obj]
+            channelList, channelFCurves, channelObjs = GetAdjustmentBlendChannelsForLayers(objList, layerIndices)
+            results = AdjustmentBlendChannels(channelList) if channelList else []
+            keysWritten = KeyAdjustmentBlendObjectResults(objList, channelList, channelFCurves, channelObjs, results)
+            print("Adjustment blend wrote %s keys on %s objects, across %s layers." % (sum([info[1] for info in keysWritten]), len(keysWritten), len(layerIndices)))
+            return keysWritten
+        else:
+            FBMessageBox("Error...", "No additive layer found. Adjustment blending affects interpolation between keys on additive layers.", "OK")
+    else:
+        FBMessageBox("Error...", "No character found. Select a character to adjustment blend.", "OK")
+
+'''
+The following functions are for adjustment blending several takes and characters in one go. Channels are read from every take first, the math is then run in a pool of worker processes (see AdjustmentBlendBatch.py), and then the results are keyed back on.
+'''
+
+# Gets the takes that are selected in the Navigator, or the current take if none are selected.
+def GetSelectedTakesOrCurrent():
+    takes = [take for take in FBSystem().Scene.Takes if take.Selected]
+    if not takes:
+        takes = [FBSystem().CurrentTake]
+    return takes
+
+# Reads the adjustment blend channels for every take and character. Takes without an additive layer are skipped. Returns the jobs for RunAdjustmentBlendJobs, and the info needed to key each job's results back on.
+def ExtractAdjustmentBlendJobs(takes, characters):
+    jobs = []
+    jobInfo = []
+    for take in takes:
+        FBSystem().CurrentTake = take
+        poseLayerIndex = GetPoseLayerIndex(take)
+        if poseLayerIndex > 0:
+            for character in characters:
+                startTime = perfCounter()
+                objList = [obj for obj in GetCharacterEffectorsAndExtensions(character) if obj]
+                channelList, channelFCurves, channelObjs = GetAdjustmentBlendChannelsForObjects(objList, poseLayerIndex)
+                jobName = take.Name + " | " + character.LongName
+                jobs.append((jobName, channelList))
+                jobInfo.append([take, character, objList, channelList, channelFCurves, channelObjs, perfCounter() - startTime])
+        else:
+            print("Adjustment blend skipped take %s: No additive layer found." % (take.Name))
+    return jobs, jobInfo
+
+# Prints progress for RunAdjustmentBlendJobs.
+def PrintAdjustmentBlendProgress(jobName, jobsDone, jobCount, seconds):
+    print("Adjustment blend %s/%s: %s (%.3fs)" % (jobsDone, jobCount, jobName, seconds))
+
+# Adjustment blends a list of characters on a list of takes. By default this is the current character on the selected takes (or the current take, if none are selected). The math runs in this process by default. Set workerCount above 1 (or to None, for one worker per CPU) to run it in a pool of worker processes, which is meant for headless batch runs rather than the Motionbuilder UI. Returns a report with [takeName, characterName, keysWritten, extractSeconds, blendSeconds, keySeconds] for each take and character.
+def AdjustmentBlendTakes(takes = None, characters = None, workerCount = 1):
+    if not takes:
+        takes = GetSelectedTakesOrCurrent()
+    if not characters:
+        characters = [FBApplication().CurrentCharacter]
+    characters = [character for character in characters if character]
+    report = []
+    if characters:
+        currentTake = FBSystem().CurrentTake
+        jobs, jobInfo = ExtractAdjustmentBlendJobs(takes, characters)
+        jobResults = RunAdjustmentBlendJobs(jobs, workerCount, PrintAdjustmentBlendProgress)
+        for info, jobResult in zip(jobInfo, jobResults):
+            take, character, objList, channelList, channelFCurves, channelObjs, extractSeconds = info
+            results, blendSeconds = jobResult
+            if FBSystem().CurrentTake != take:
+                FBSystem().CurrentTake = take
+            startTime = perfCounter()
+            keysWritten = KeyAdjustmentBlendObjectResults(objList, channelList, channelFCurves, channelObjs, results)
+            keySeconds = perfCounter() - startTime
+            report.append([take.Name, character.LongName, sum([info[1] for info in keysWritten]), extractSeconds, blendSeconds, keySeconds])
+        FBSystem().CurrentTake = currentTake
+        for takeName, characterName, keyCount, extractSeconds, blendSeconds, keySeconds in report:
+            print("%s | %s: %s keys. Extract %.3fs, blend %.3fs, key %.3fs." % (takeName, characterName, keyCount, extractSeconds, blendSeconds, keySeconds))
+    else:
+        FBMessageBox("Error...", "No character found. Select a character, or pass in the characters to adjustment blend.", "OK")
+    return report
+
+'''
+The following functions are for adjustment blending outside of Motionbuilder. Export the channels to a file, run the file through AdjustmentBlendFile.py (which doesn't need Motionbuilder), then import the blended keys back on.
+'''
+
+# Gets the name used for an object's channel in adjustment blend files.
+def GetAdjustmentBlendChannelName(obj, channelIndex):
+    return "%s|%s" % (obj.LongName, channelIndex)
+
+# Yields a channel file record for every channel with two or more keys on the top most additive layer, for a list of objects.
+def IterAdjustmentBlendRecords(objList):
+    take = FBSystem().CurrentTake
+    poseLayerIndex = GetPoseLayerIndex(take)
+    fcurveTable = GetLayerFCurveTable(objList, [poseLayerIndex, 0])
+    for i, obj in enumerate(objList):
+        poseLayerFCurves = fcurveTable[poseLayerIndex][i]
+        baseLayerFCurves = fcurveTable[0][i]
+        for channelIndex in range(len(poseLayerFCurves)):
+            keyFrames, keyValues = GetFCurveKeyFramesAndValues(poseLayerFCurves[channelIndex])
+            if len(keyFrames) > 1:
+                baseSamples = SampleFCurve(baseLayerFCurves[channelIndex], GetChannelSampleFrames(keyFrames))
+                yield [GetAdjustmentBlendChannelName(obj, channelIndex), baseSamples, keyFrames, keyValues]
+
+# Exports the base layer samples and top most additive layer keys for a character to an adjustment blend file. Returns the number of channels exported.
+def ExportAdjustmentBlendFile(filePath, character = None):
+    if not character:
+        character = FBApplication().CurrentCharacter
+    channelCount = 0
+    if character:
+        if GetPoseLayerIndex() > 0:
+            objList = [obj for obj in GetCharacterEffectorsAndExtensions(character) if obj]
+            channelCount = WriteChannelFile(filePath, IterAdjustmentBlendRecords(objList))
+        else:
+            FBMessageBox("Error...", "No additive layer found. Adjustment blending affects interpolation between keys on the top most additive layer.", "OK")
+    return channelCount
+
+# Keys the blended keys from an adjustment blend output file onto the top most additive layer of a character. Returns a list of [obj, keysWritten] for each character object.
+def ImportAdjustmentBlendFile(filePath, character = None):
+    if not character:
+        character = FBApplication().CurrentCharacter
+    keysWritten = []
+    if character:
+        take = FBSystem().CurrentTake
+        poseLayerIndex = GetPoseLayerIndex(take)
+        if poseLayerIndex > 0:
+            objList = [obj for obj in GetCharacterEffectorsAndExtensions(character) if obj]
+            poseLayerFCurves = GetLayerFCurveTable(objList, [poseLayerIndex])[poseLayerIndex]
+            channelFCurves = {}
+            for obj, fcurves in zip(objList, poseLayerFCurves):
+                for channelIndex in range(len(fcurves)):
+                    channelFCurves[GetAdjustmentBlendChannelName(obj, channelIndex)] = [obj, fcurves[channelIndex]]
+            keyCounts = dict.fromkeys(objList, 0)
+            FBBeginChangeAllModels()
+            try:
+                for name, baseSamples, keyFrames, keyValues in IterChannelFile(filePath):
+                    if name in channelFCurves:
+                        obj, fcurve = channelFCurves[name]
+                        keyCounts[obj] += KeyFCurveFrames(fcurve, keyFrames.tolist(), keyValues.tolist())
+                    else:
+                        print("Adjustment blend import skipped channel %s: Not found on this character." % (name))
+            finally:
+                FBEndChangeAllModels()
+            keysWritten = [[obj, keyCount] for obj, keyCount in keyCounts.items()]
+        else:
+            FBMessageBox("Error...", "No additive layer found. Adjustment blending affects interpolation between keys on the top most additive layer.", "OK")
+    return keysWritten
+
+'''
+The following functions are for incremental adjustment blending, where only the key pairs that have changed since the last run get blended again.
+
+After a run, every frame between the keys is keyed, so the original pose keys can't be told apart from the blended keys just by looking at the curve. Instead, the pose key frames and a fingerprint for each key pair are stored on the take, per layer and channel, along with the number of keys the channel had after blending. This is done for full and incremental runs of AdjustmentBlendObjectList. On the next run, if a channel still has that number of keys, its pose keys are read back from the stored frames. If keys have been added or removed since (or there's no stored record, but every frame is keyed), the pose keys can't be worked out, so an incremental run skips the channel and warns, and a full run treats every key on the channel as a pose key. Changes to the base layer aren't tracked, so run a full adjustment blend after editing the base layer.
+'''
+
+ADJUSTMENT_BLEND_FINGERPRINTS_PROPERTY = "MobuCore Adjustment Blend Fingerprints"
+
+# Loads the stored fingerprints for a take, as a dictionary of layer name to a dictionary of channel name to fingerprint record.
+def LoadAdjustmentBlendFingerprints(take):
+    fingerprints = {}
+    prop = take.PropertyList.Find(ADJUSTMENT_BLEND_FINGERPRINTS_PROPERTY)
+    if prop and prop.Data:
+        try:
+            fingerprints = json.loads(prop.Data)
+        except:
+            print("Adjustment blend fingerprints on take %s couldn't be read, so all key pairs will be blended." % (take.Name))
+    return fingerprints
+
+# Stores the fingerprints on a take, in a custom string property.
+def SaveAdjustmentBlendFingerprints(take, fingerprints):
+    prop = CreateCustomProperty(take, "String", ADJUSTMENT_BLEND_FINGERPRINTS_PROPERTY)
+    prop.Data = json.dumps(fingerprints, separators = (",", ":"))
+
+# Gets the values of an fcurve on a list of float frames.
+def EvaluateFCurveFrames(fcurve, frames):
+    return SampleFCurve(fcurve, frames).tolist()
+
+# Gets the pose key frames and values for a channel, using the stored fingerprint record when the channel hasn't had keys added or removed since it was made. Also returns whether the pose keys could be worked out. They can't if keys have been added or removed since the record was made, or if there's no record and every sample frame between the first and last key is keyed (i.e. it's already been blended).
+def GetPoseKeysForChannel(poseFCurve, record):
+    keyCount = len(poseFCurve.Keys)
+    if record and keyCount == record["keyCount"]:
+        keyFrames = record["poseFrames"]
+        return keyFrames, EvaluateFCurveFrames(poseFCurve, keyFrames), True
+    keyFrames, keyValues = GetFCurveKeyFramesAndValues(poseFCurve)
+    if record:
+        return keyFrames, keyValues, False
+    isBaked = keyCount > 2 and len(GetChannelSampleFrames(keyFrames)) == keyCount
+    return keyFrames, keyValues, not isBaked
+
+# Gets adjustment blend channels for only the key pairs that have changed since the last run, or for every key pair when incremental is False. Each run of changed key pairs becomes its own channel. Also returns a [channelName, poseFCurve, poseFrames, pairFingerprints] record for every channel that was checked, and the names of the channels an incremental run had to skip because their pose keys couldn't be worked out.
+def GetIncrementalAdjustmentBlendChannels(objList, poseLayerIndex, baseLayerIndex, layerFingerprints, incremental = True):
+    fcurveTable = GetLayerFCurveTable(objList, [poseLayerIndex, baseLayerIndex])
+    channelList = []
+    channelFCurves = []
+    channelObjs = []
+    channelRecords = []
+    staleChannelNames = []
+    for i, obj in enumerate(objList):
+        poseLayerFCurves = fcurveTable[poseLayerIndex][i]
+        baseLayerFCurves = fcurveTable[baseLayerIndex][i]
+        for channelIndex in range(len(poseLayerFCurves)):
+            poseFCurve = poseLayerFCurves[channelIndex]
+            channelName = GetAdjustmentBlendChannelName(obj, channelIndex)
+            record = layerFingerprints.get(channelName)
+            keyFrames, keyValues, posesFound = GetPoseKeysForChannel(poseFCurve, record)
+            if incremental and not posesFound:
+                staleChannelNames.append(channelName)
+                continue
+            if len(keyFrames) > 1:
+                fingerprints = GetKeyPairFingerprints(keyFrames, keyValues)
+                previousFingerprints = set(record["pairs"]) if record and incremental else set()
+                for startKey, stopKey in GetChangedKeyPairRuns(keyFrames, fingerprints, previousFingerprints):
+                    runFrames = keyFrames[startKey:stopKey+1]
+                    baseSamples = SampleFCurve(baseLayerFCurves[channelIndex], GetChannelSampleFrames(runFrames))
+                    channelList.append((baseSamples, runFrames, keyValues[startKey:stopKey+1]))
+                    channelFCurves.append(poseFCurve)
+                    channelObjs.append(obj)
+                channelRecords.append([channelName, poseFCurve, keyFrames, fingerprints])
+    return channelList, channelFCurves, channelObjs, channelRecords, staleChannelNames
+
+# Updates the fingerprints for a layer after the channels have been keyed.
+def UpdateAdjustmentBlendFingerprints(layerFingerprints, channelRecords):
+    for channelName, poseFCurve, keyFrames, fingerprints in channelRecords:
+        layerFingerprints[channelName] = {"poseFrames": list(keyFrames), "pairs": fingerprints, "keyCount": len(poseFCurve.Keys)}
+
+# Adjustment blends only the key pairs on a character that have changed since the last time this was run.
+def AdjustmentBlendCharacterChangedPoses(character = None):
+    return AdjustmentBlendCharacter(character, True)
+
+'''
+The following are for previewing an adjustment blend before keying it on. The blend is worked out in memory, one object at a time, for only the objects you want to look at. To show it, the difference between the blend and the current layer curve is keyed on a temporary layer above the other layers, so the pose layer's fcurves aren't touched, and discarding the preview just deletes that layer. Committing works out the blend again for every character object, so any pose edits made after previewing are picked up, keys it on the pose layer, and deletes the preview layer. The other adjustment blend options skip the preview layer when picking the top most additive layer.
+
+To note: The preview layer relies on additive layer values adding together, so rotations only preview exactly when the layer's rotation mode is set to add each channel.
+'''
+
+ADJUSTMENT_BLEND_PREVIEW_LAYER_NAME = "Adjustment Blend Preview"
+
+class AdjustmentBlendPreview(object):
+    def __init__(self, character = None, poseLayerIndex = None):
+        if not character:
+            character = FBApplication().CurrentCharacter
+        self.character = character
+        self.take = FBSystem().CurrentTake
+        if poseLayerIndex is None:
+            poseLayerIndex = GetPoseLayerIndex(self.take)
+        self.poseLayerIndex = poseLayerIndex
+        self.objList = [obj for obj in GetCharacterEffectorsAndExtensions(character) if obj] if character else []
+        self.objResults = {}
+        self.previewLayer = None
+
+    # Works out the blend for a list of objects, without keying anything. Each object's result is a list of [channelIndex, poseFCurve, frames, values].
+    def Evaluate(self, objList):
+        objList = [obj for obj in objList if obj]
+        fcurveTable = GetLayerFCurveTable(objList, [self.poseLayerIndex, 0])
+        channelList = []
+        channelInfo = []
+        for i, obj in enumerate(objList):
+            self.objResults[obj] = []
+            poseLayerFCurves = fcurveTable[self.poseLayerIndex][i]
+            baseLayerFCurves = fcurveTable[0][i]
+            for channelIndex in range(len(poseLayerFCurves)):
+                keyFrames, keyValues = GetFCurveKeyFramesAndValues(poseLayerFCurves[channelIndex])
+                if len(keyFrames) > 1:
+                    baseSamples = SampleFCurve(baseLayerFCurves[channelIndex], GetChannelSampleFrames(keyFrames))
+                    channelList.append((baseSamples, keyFrames, keyValues))
+                    channelInfo.append([obj, channelIndex, poseLayerFCurves[channelIndex]])
+        results = AdjustmentBlendChannels(channelList) if channelList else []
+        for channel, info, result in zip(channelList, channelInfo, results):
+            blendedValues, writeMask = result
+            frameIndices = np.flatnonzero(writeMask)
+            frames = GetChannelSampleFrames(channel[1])[frameIndices].tolist()
+            self.objResults[info[0]].append([info[1], info[2], frames, blendedValues[frameIndices].tolist()])
+
+    # Gets the blended curves for an object as a list of [channelIndex, poseFCurve, frames, values], working them out if they haven't been already.
+    def GetBlendedCurves(self, obj):
+        if obj not in self.objResults:
+            self.Evaluate([obj])
+        return self.objResults[obj]
+
+    # Gets the preview layer, creating it if needed.
+    def GetPreviewLayer(self):
+        if not self.previewLayer:
+            currentLayerIndex = self.take.GetCurrentLayer()
+            self.previewLayer = CreateNewLayer(ADJUSTMENT_BLEND_PREVIEW_LAYER_NAME)
+            self.take.SetCurrentLayer(currentLayerIndex)
+        return self.previewLayer
+
+    # Shows the blend for a list of objects on the preview layer. Works out the blend again for these objects, so any key changes since the last preview are picked up.
+    def Show(self, objList):
+        objList = [obj for obj in objList if obj in self.objList]
+        if objList:
+            self.Evaluate(objList)
+            previewLayerIndex = self.GetPreviewLayer().GetLayerIndex()
+            previewFCurves = GetLayerFCurveTable(objList, [previewLayerIndex])[previewLayerIndex]
+            FBBeginChangeAllModels()
+            try:
+                for obj, objPreviewFCurves in zip(objList, previewFCurves):
+                    for channelIndex, poseFCurve, frames, values in self.objResults[obj]:
+                        currentValues = EvaluateFCurveFrames(poseFCurve, frames)
+                        offsets = [value - currentValue for value, currentValue in zip(values, currentValues)]
+                        objPreviewFCurves[channelIndex].EditClear()
+                        KeyFCurveFrames(objPreviewFCurves[channelIndex], frames, offsets)
+            finally:
+                FBEndChangeAllModels()
+        return objList
+
+    # Deletes the preview layer and forgets the worked out blends.
+    def Discard(self):
+        if self.previewLayer:
+            self.previewLayer.FBDelete()
+            self.previewLayer = None
+        self.objResults = {}
+
+    # Works out the blend again for every character object from the current keys, keys it on the pose layer, then discards the preview. Returns a list of [obj, keysWritten] for each object.
+    def Commit(self):
+        self.Evaluate(self.objList)
+        keysWritten = []
+        FBBeginChangeAllModels()
+        try:
+            for obj in self.objList:
+                keyCount = 0
+                for channelIndex, poseFCurve, frames, values in self.objResults[obj]:
+                    keyCount += KeyFCurveFrames(poseFCurve, frames, values)
+                keysWritten.append([obj, keyCount])
+        finally:
+            FBEndChangeAllModels()
+        self.Discard()
+        return keysWritten
+
+# The preview the menu options are working with.
+currentAdjustmentBlendPreview = None
+
+# Gets the current preview, starting a new one if there isn't one for the current take and character.
+def GetAdjustmentBlendPreview():
+    global currentAdjustmentBlendPreview
+    preview = currentAdjustmentBlendPreview
+    if not preview or preview.take != FBSystem().CurrentTake or preview.character != FBApplication().CurrentCharacter:
+        if preview:
+            preview.Discard()
+        preview = AdjustmentBlendPreview()
+        currentAdjustmentBlendPreview = preview
+    return preview
+
+# Previews the adjustment blend for the selected character objects.
+def PreviewAdjustmentBlendSelected():
+    if FBApplication().CurrentCharacter and GetPoseLayerIndex() > 0:
+        selected = GetSelected()
+        if not isinstance(selected, list):
+            selected = [selected]
+        preview = GetAdjustmentBlendPreview()
+        if not preview.Show(selected):
+            FBMessageBox("Error...", "No character objects selected. Select the effectors you want to preview the adjustment blend on.", "OK")
+    else:
+        FBMessageBox("Error...", "No additive layer found. Adjustment blending affects interpolation between keys on the top most additive layer.", "OK")
+
+# Keys the previewed adjustment blend onto the pose layer, for the whole character.
+def CommitAdjustmentBlendPreview():
+    global currentAdjustmentBlendPreview
+    keysWritten = []
+    if currentAdjustmentBlendPreview:
+        keysWritten = currentAdjustmentBlendPreview.Commit()
+        currentAdjustmentBlendPreview = None
+        print("Adjustment blend wrote %s keys on %s objects." % (sum([info[1] for info in keysWritten]), len(keysWritten)))
+    else:
+        FBMessageBox("Error...", "No adjustment blend preview found.", "OK")
+    return keysWritten
+
+# Deletes the adjustment blend preview.
+def DiscardAdjustmentBlendPreview():
+    global currentAdjustmentBlendPreview
+    if currentAdjustmentBlendPreview:
+        currentAdjustmentBlendPreview.Discard()
+        currentAdjustmentBlendPreview = None
@@ -0,0 +1,103 @@
+'''
+Runs the Adjustment Blend math for many takes and characters at once, spread over a pool of worker processes.
+
+Each job is a name and a channel list (see AdjustmentBlendMath.PackChannels). Getting the channels out of Motionbuilder and keying the results back on has to happen on Motionbuilder's main thread, so that's done in AdjustmentBlend.py. This script only does the math part, and doesn't import pyfbsdk, so the workers can run in a plain Python process (and the speed up can be measured outside of Motionbuilder).
+
+NumPy is required for this script.
+____________________________________________________________________
+
+This script was written by Dan Lowe as part of the MobuCore package.  You can reach Dan Lowe on Twitter at https://twitter.com/danlowlows (at time of writing, direct messages are open).
+
+MobuCore is made available under the following license terms:
+
+MIT License
+
+Copyright (c) 2023 Dan Lowe
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import os
+import sys
+import time
+import multiprocessing
+from MobuCore.MobuCoreTools.AdjustmentBlend.AdjustmentBlendMath import AdjustmentBlendChannels
+
+# Timer for measuring how long jobs take, the same as MobuCoreLibrary's (which isn't imported here, so that worker processes don't load pyfbsdk). time.perf_counter doesn't exist on Python 2.7, so that falls back to time.time.
+perfCounter = getattr(time, "perf_counter", time.time)
+
+'''
+Inside Motionbuilder, sys.executable is motionbuilder.exe rather than a Python interpreter, so worker processes need to be pointed at mobupy instead.
+'''
+
+# Gets the Python interpreter to start worker processes with.
+def GetWorkerExecutable():
+    executable = sys.executable
+    if os.path.basename(executable).lower().startswith("motionbuilder"):
+        for name in ["mobupy.exe", "mobupy"]:
+            mobupyPath = os.path.join(os.path.dirname(executable), name)
+            if os.path.isfile(mobupyPath):
+                return mobupyPath
+    return executable
+
+# Gets a spawn context that starts workers with GetWorkerExecutable.
+def GetWorkerContext():
+    context = multiprocessing.get_context("spawn")
+    context.set_executable(GetWorkerExecutable())
+    return context
+
+'''
+The following functions run the jobs.
+'''
+
+# Runs a single job. This is what the worker processes run. Returns the job name, the (blendedValues, writeMask) results for each channel, and how long the math took in seconds.
+def RunAdjustmentBlendJob(job):
+    jobName, channelList = job
+    startTime = perfCounter()
+    results = AdjustmentBlendChannels(channelList)
+    return jobName, results, perfCounter() - startTime
+
+# Runs a list of (jobName, channelList) jobs. Uses a process pool when there's more than one worker and more than one job, otherwise runs them in this process (as it also does on Python 2.7, which doesn't have concurrent.futures). progressCallback is called with (jobName, jobsDone, jobCount, seconds) as each job finishes. Returns a list of (results, seconds), in the same order as jobs.
+def RunAdjustmentBlendJobs(jobs, workerCount = None, progressCallback = None):
+    if workerCount is None:
+        workerCount = multiprocessing.cpu_count()
+    workerCount = max(1, min(workerCount, len(jobs)))
+    jobResults = [None] * len(jobs)
+    jobsDone = [0]
+
+    def JobDone(jobIndex, jobName, results, seconds):
+        jobResults[jobIndex] = (results, seconds)
+        jobsDone[0] += 1
+        if progressCallback:
+            progressCallback(jobName, jobsDone[0], len(jobs), seconds)
+
+    if workerCount > 1:
+        try:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+        except ImportError:
+            workerCount = 1
+    if workerCount == 1:
+        for jobIndex, job in enumerate(jobs):
+            JobDone(jobIndex, *RunAdjustmentBlendJob(job))
+    else:
+        with ProcessPoolExecutor(max_workers = workerCount, mp_context = GetWorkerContext()) as executor:
+            futures = {executor.submit(RunAdjustmentBlendJob, job): jobIndex for jobIndex, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                JobDone(futures[future], *future.result())
+    return jobResults
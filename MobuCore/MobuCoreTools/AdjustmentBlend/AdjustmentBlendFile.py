@@ -0,0 +1,176 @@
+'''
+Reads and writes adjustment blend channel files, and runs adjustment blending on them from the command line. This lets adjustment blending run on machines that don't have Motionbuilder (e.g. a farm), using the same math as AdjustmentBlendObject.
+
+Export the channels from Motionbuilder with ExportAdjustmentBlendFile (in AdjustmentBlend.py), then run:
+
+    python -m MobuCore.MobuCoreTools.AdjustmentBlend.AdjustmentBlendFile input.mcab output.mcab
+
+Then load the blended keys back on with ImportAdjustmentBlendFile.
+
+File format (all little endian): the 4 byte header "MCAB", a uint16 version number, then one record per channel until the end of the file. A record is a uint16 name length and utf-8 name, a uint32 base layer sample count and that many float64 samples (one per sample frame, see AdjustmentBlendMath.GetChannelSampleFrames), then a uint32 key count, that many float64 key frames, and that many float64 key values. Key frames are floats so that keys between frames keep their exact time. Input files hold the dense base layer samples and the sparse layer keys. Output files hold the blended keys, with no base layer samples.
+
+Files are read and written one record at a time, so memory use depends on the chunk size rather than the size of the file.
+
+NumPy is required for this script. It doesn't import pyfbsdk.
+____________________________________________________________________
+
+This script was written by Dan Lowe as part of the MobuCore package.  You can reach Dan Lowe on Twitter at https://twitter.com/danlowlows (at time of writing, direct messages are open).
+
+MobuCore is made available under the following license terms:
+
+MIT License
+
+Copyright (c) 2023 Dan Lowe
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import sys
+import struct
+import argparse
+import numpy as np
+from MobuCore.MobuCoreTools.AdjustmentBlend.AdjustmentBlendMath import AdjustmentBlendChannels, GetChannelSampleFrames
+
+FILE_HEADER = b"MCAB"
+FILE_VERSION = 2
+
+'''
+The following functions are for reading and writing channel files. A record is [name, baseSamples, keyFrames, keyValues].
+'''
+
+# Reads exactly byteCount bytes from a file, or raises an error if the file ends first.
+def ReadBytes(f, byteCount):
+    data = f.read(byteCount)
+    if len(data) != byteCount:
+        raise ValueError("Adjustment blend file ended part way through a channel.")
+    return data
+
+# Writes the file header.
+def WriteChannelFileHeader(f):
+    f.write(FILE_HEADER + struct.pack("<H", FILE_VERSION))
+
+# Reads and checks the file header.
+def ReadChannelFileHeader(f):
+    header = f.read(len(FILE_HEADER) + 2)
+    if len(header) != len(FILE_HEADER) + 2 or header[:len(FILE_HEADER)] != FILE_HEADER:
+        raise ValueError("Not an adjustment blend file.")
+    version = struct.unpack("<H", header[len(FILE_HEADER):])[0]
+    if version != FILE_VERSION:
+        raise ValueError("Unsupported adjustment blend file version: %s" % (version))
+
+# Writes one channel record.
+def WriteChannelRecord(f, name, baseSamples, keyFrames, keyValues):
+    nameBytes = name.encode("utf-8")
+    baseSamples = np.asarray(baseSamples, dtype="<f8")
+    keyFrames = np.asarray(keyFrames, dtype="<f8")
+    keyValues = np.asarray(keyValues, dtype="<f8")
+    if len(keyFrames) != len(keyValues):
+        raise ValueError("Channel %s needs one value per key." % (name))
+    f.write(struct.pack("<H", len(nameBytes)) + nameBytes)
+    f.write(struct.pack("<I", len(baseSamples)))
+    f.write(baseSamples.tobytes())
+    f.write(struct.pack("<I", len(keyFrames)))
+    f.write(keyFrames.tobytes())
+    f.write(keyValues.tobytes())
+
+# Reads one channel record, or returns None at the end of the file.
+def ReadChannelRecord(f):
+    nameLength = f.read(2)
+    if not nameLength:
+        return None
+    if len(nameLength) != 2:
+        raise ValueError("Adjustment blend file ended part way through a channel.")
+    name = ReadBytes(f, struct.unpack("<H", nameLength)[0]).decode("utf-8")
+    sampleCount = struct.unpack("<I", ReadBytes(f, 4))[0]
+    baseSamples = np.frombuffer(ReadBytes(f, sampleCount * 8), dtype="<f8")
+    keyCount = struct.unpack("<I", ReadBytes(f, 4))[0]
+    keyFrames = np.frombuffer(ReadBytes(f, keyCount * 8), dtype="<f8")
+    keyValues = np.frombuffer(ReadBytes(f, keyCount * 8), dtype="<f8")
+    return [name, baseSamples, keyFrames, keyValues]
+
+# Yields the channel records in a file, one at a time.
+def IterChannelFile(filePath):
+    with open(filePath, "rb") as f:
+        ReadChannelFileHeader(f)
+        record = ReadChannelRecord(f)
+        while record is not None:
+            yield record
+            record = ReadChannelRecord(f)
+
+# Writes a list (or generator) of channel records to a file. Returns the number of records written.
+def WriteChannelFile(filePath, records):
+    recordCount = 0
+    with open(filePath, "wb") as f:
+        WriteChannelFileHeader(f)
+        for record in records:
+            WriteChannelRecord(f, *record)
+            recordCount += 1
+    return recordCount
+
+'''
+The following functions run adjustment blending over channel records.
+'''
+
+# Gets the kernel channel for a record, checking there's a base layer sample for each of its sample frames.
+def GetChannelFromRecord(record):
+    name, baseSamples, keyFrames, keyValues = record
+    if len(baseSamples) != len(GetChannelSampleFrames(keyFrames)):
+        raise ValueError("Channel %s doesn't have base layer samples for all of its sample frames." % (name))
+    return (baseSamples, keyFrames, keyValues)
+
+# Adjustment blends a list of records. Returns an output record with the blended keys for each record that has two or more keys.
+def AdjustmentBlendRecords(records):
+    records = [record for record in records if len(record[2]) > 1]
+    results = AdjustmentBlendChannels([GetChannelFromRecord(record) for record in records])
+    outputRecords = []
+    for record, result in zip(records, results):
+        blendedValues, writeMask = result
+        frameIndices = np.flatnonzero(writeMask)
+        outputRecords.append([record[0], [], GetChannelSampleFrames(record[2])[frameIndices], blendedValues[frameIndices]])
+    return outputRecords
+
+# Yields blended output records for the records in an input file, reading and blending chunkSize channels at a time.
+def IterAdjustmentBlendFile(inputFilePath, chunkSize = 256):
+    chunk = []
+    for record in IterChannelFile(inputFilePath):
+        chunk.append(record)
+        if len(chunk) >= chunkSize:
+            for outputRecord in AdjustmentBlendRecords(chunk):
+                yield outputRecord
+            chunk = []
+    for outputRecord in AdjustmentBlendRecords(chunk):
+        yield outputRecord
+
+# Adjustment blends every channel in an input file, and writes the blended keys to an output file. Returns the number of channels written.
+def AdjustmentBlendFile(inputFilePath, outputFilePath, chunkSize = 256):
+    return WriteChannelFile(outputFilePath, IterAdjustmentBlendFile(inputFilePath, chunkSize))
+
+# Command line entry point.
+def Main(args = None):
+    parser = argparse.ArgumentParser(description = "Adjustment blends the channels in a MobuCore adjustment blend file.")
+    parser.add_argument("inputFile", help = "Channel file exported from Motionbuilder.")
+    parser.add_argument("outputFile", help = "File to write the blended keys to.")
+    parser.add_argument("--chunk-size", type = int, default = 256, help = "Number of channels to blend at a time (default 256).")
+    args = parser.parse_args(args)
+    channelCount = AdjustmentBlendFile(args.inputFile, args.outputFile, max(1, args.chunk_size))
+    print("Adjustment blended %s channels." % (channelCount))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(Main())
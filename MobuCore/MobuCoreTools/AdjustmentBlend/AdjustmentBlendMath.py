@@ -0,0 +1,158 @@
+'''
+Array kernel for Adjustment Blending. This is the same math as AdjustmentBlendObject, but it works on NumPy arrays for every channel and key pair in one call, so it can be run (and tested) outside of Motionbuilder.
+
+For each key pair on the layer, the base layer's cumulative absolute change across the key pair's frames is normalized to a 0-1 range, then scaled by the layer's change between the two keys. Key pairs where the base layer doesn't move are left alone, same as the original per frame loop.
+
+NumPy is required for this script. It doesn't import pyfbsdk.
+____________________________________________________________________
+
+This script was written by Dan Lowe as part of the MobuCore package.  You can reach Dan Lowe on Twitter at https://twitter.com/danlowlows (at time of writing, direct messages are open).
+
+MobuCore is made available under the following license terms:
+
+MIT License
+
+Copyright (c) 2023 Dan Lowe
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import math
+import zlib
+import numpy as np
+
+'''
+A channel is one base layer curve sampled on every frame from its first layer key to its last layer key, plus the layer keys themselves. Key frames are floats, so keys that sit between frames keep their exact time. Channels are packed end to end into flat arrays, so that a whole object or a whole character can go through the kernel at once.
+'''
+
+# Gets the frames a channel is sampled on: every key frame, plus every whole frame between the first and last key. When the keys are all on whole frames, this is just every frame from the first key to the last.
+def GetChannelSampleFrames(keyFrames):
+    keyFrames = np.asarray(keyFrames, dtype=np.float64)
+    wholeFrames = np.arange(np.floor(keyFrames[0]) + 1, np.ceil(keyFrames[-1]))
+    return np.union1d(wholeFrames, keyFrames)
+
+# Packs a list of channels into flat arrays. Each channel is (baseSamples, keyFrames, keyValues), where baseSamples holds one value per sample frame (see GetChannelSampleFrames).
+def PackChannels(channelList):
+    sampleArrays = []
+    keyPositionArrays = []
+    keyValueArrays = []
+    sampleOffsets = [0]
+    keyOffsets = [0]
+    for baseSamples, keyFrames, keyValues in channelList:
+        baseSamples = np.asarray(baseSamples, dtype=np.float64)
+        keyFrames = np.asarray(keyFrames, dtype=np.float64)
+        keyValues = np.asarray(keyValues, dtype=np.float64)
+        if len(keyFrames) < 2 or len(keyFrames) != len(keyValues):
+            raise ValueError("Each channel needs two or more keys, with one value per key.")
+        if np.any(np.diff(keyFrames) <= 0):
+            raise ValueError("Key frames need to be in order, with no two keys on the same frame.")
+        sampleFrames = GetChannelSampleFrames(keyFrames)
+        if len(baseSamples) != len(sampleFrames):
+            raise ValueError("Each channel needs one base layer sample per sample frame between its first and last key.")
+        sampleArrays.append(baseSamples)
+        keyPositionArrays.append(np.searchsorted(sampleFrames, keyFrames) + sampleOffsets[-1])
+        keyValueArrays.append(keyValues)
+        sampleOffsets.append(sampleOffsets[-1] + len(baseSamples))
+        keyOffsets.append(keyOffsets[-1] + len(keyFrames))
+    if not sampleArrays:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64), empty, np.zeros(1, dtype=np.int64)
+    samples = np.concatenate(sampleArrays)
+    keyPositions = np.concatenate(keyPositionArrays)
+    keyValues = np.concatenate(keyValueArrays)
+    return samples, np.asarray(sampleOffsets, dtype=np.int64), keyPositions, keyValues, np.asarray(keyOffsets, dtype=np.int64)
+
+# Splits a flat per sample array back into one view per channel.
+def UnpackChannels(values, sampleOffsets):
+    return np.split(values, sampleOffsets[1:-1])
+
+'''
+The kernel itself.
+'''
+
+# Running total of the absolute frame to frame change on the base layer. Resets at the start of every channel, so a difference between two positions in the same channel is the change between them.
+def GetCumulativeBaseLayerChange(samples, sampleOffsets):
+    change = np.empty_like(samples)
+    if len(samples) == 0:
+        return change
+    change[0] = 0.0
+    np.abs(np.diff(samples), out=change[1:])
+    change[sampleOffsets[:-1]] = 0.0
+    return np.cumsum(change, out=change)
+
+# Adjustment blends packed channels (see PackChannels). Returns the blended value for every sample, and a mask of which samples should be keyed.
+def AdjustmentBlendPacked(samples, sampleOffsets, keyPositions, keyValues, keyOffsets):
+    sampleCount = len(samples)
+    keyCount = len(keyPositions)
+    if sampleCount == 0:
+        return np.empty(0, dtype=np.float64), np.zeros(0, dtype=bool)
+    cumulative = GetCumulativeBaseLayerChange(samples, sampleOffsets)
+
+    # A pair is made from each key and the key after it, unless the key is the last key on its channel.
+    isLastKey = np.zeros(keyCount, dtype=bool)
+    isLastKey[keyOffsets[1:] - 1] = True
+    pairTotals = cumulative[keyPositions[1:]] - cumulative[keyPositions[:-1]]
+    pairValid = (pairTotals != 0.0) & ~isLastKey[:-1]
+
+    # The key pair each sample falls in. A sample on a key starts the next pair, except on the channel's last key where it ends the previous one.
+    pairIndex = np.searchsorted(keyPositions, np.arange(sampleCount), side="right") - 1
+    pairIndex -= isLastKey[pairIndex]
+    startValues = keyValues[pairIndex]
+    stopValues = keyValues[pairIndex + 1]
+    totals = pairTotals[pairIndex]
+    writeMask = pairValid[pairIndex]
+
+    normalized = cumulative - cumulative[keyPositions[pairIndex]]
+    np.divide(normalized, totals, out=normalized, where=writeMask)
+    blended = startValues + (stopValues - startValues) * normalized
+
+    # Keys keep their exact values, and are keyed if either pair they belong to was blended.
+    blended[keyPositions] = keyValues
+    paddedValid = np.concatenate(([False], pairValid, [False]))
+    writeMask[keyPositions] = paddedValid[1:] | paddedValid[:-1]
+    return blended, writeMask
+
+# Adjustment blends a list of channels (see PackChannels). Returns a (blendedValues, writeMask) pair of arrays for each channel, indexed by that channel's sample frames (see GetChannelSampleFrames).
+def AdjustmentBlendChannels(channelList):
+    if not channelList:
+        return []
+    samples, sampleOffsets, keyPositions, keyValues, keyOffsets = PackChannels(channelList)
+    blended, writeMask = AdjustmentBlendPacked(samples, sampleOffsets, keyPositions, keyValues, keyOffsets)
+    return list(zip(UnpackChannels(blended, sampleOffsets), UnpackChannels(writeMask, sampleOffsets)))
+
+'''
+The following functions are for only re-blending key pairs that have changed since the last adjustment blend. Each key pair gets a fingerprint made from the frames and values of its two keys.
+'''
+
+# Gets a fingerprint for each key pair on a channel.
+def GetKeyPairFingerprints(keyFrames, keyValues):
+    keyFrames = np.asarray(keyFrames, dtype="<f8")
+    keyValues = np.asarray(keyValues, dtype="<f8")
+    return [zlib.crc32(keyFrames[i:i+2].tobytes() + keyValues[i:i+2].tobytes()) for i in range(len(keyFrames)-1)]
+
+# Gets the runs of neighbouring key pairs that need blending, as [startKeyIndex, stopKeyIndex] pairs. A key pair needs blending if its fingerprint isn't in previousFingerprints, and there's at least one whole frame between its keys.
+def GetChangedKeyPairRuns(keyFrames, fingerprints, previousFingerprints):
+    runs = []
+    for i in range(len(fingerprints)):
+        if fingerprints[i] not in previousFingerprints and math.floor(keyFrames[i]) + 1 < keyFrames[i+1]:
+            if runs and runs[-1][1] == i:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1])
+    return runs
@@ -0,0 +1,226 @@
+'''
+Benchmarks AdjustmentBlendCharacter outside of Motionbuilder, using the pyfbsdk stand-in in StubPyfbsdk.py.
+
+For each size, a synthetic character is built with a dense base layer and a sparse additive layer, then adjustment blended twice: once with the current AdjustmentBlendCharacter, and once with the reference per frame loop that AdjustmentBlendObject originally used. Wall time and the number of Evaluate, KeyAdd and SetCurrentLayer calls are recorded for both, and the blended layers are compared against each other.
+
+Run from the folder that contains MobuCore, e.g.
+
+    python -m MobuCore.MobuCoreTools.AdjustmentBlend.Benchmark.AdjustmentBlendBenchmark --effectors 10 30 60 --frames 1000 5000 --key-pairs 4
+
+The exit code is 1 if any blended layer doesn't match the reference.
+
+NumPy is required for this script. It can't be run inside Motionbuilder.
+____________________________________________________________________
+
+This script was written by Dan Lowe as part of the MobuCore package.  You can reach Dan Lowe on Twitter at https://twitter.com/danlowlows (at time of writing, direct messages are open).
+
+MobuCore is made available under the following license terms:
+
+MIT License
+
+Copyright (c) 2023 Dan Lowe
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import io
+import sys
+import math
+import time
+import random
+import argparse
+import contextlib
+
+'''
+The stub has to be installed as pyfbsdk before anything from MobuCore that imports pyfbsdk is loaded.
+'''
+
+# Installs StubPyfbsdk as the pyfbsdk module, and returns it.
+def InstallStubPyfbsdk():
+    from MobuCore.MobuCoreTools.AdjustmentBlend.Benchmark import StubPyfbsdk
+    pyfbsdk = sys.modules.get("pyfbsdk")
+    if pyfbsdk is not None and pyfbsdk is not StubPyfbsdk:
+        raise RuntimeError("The adjustment blend benchmark uses a stand-in pyfbsdk, so it can't be run inside Motionbuilder.")
+    sys.modules["pyfbsdk"] = StubPyfbsdk
+    return StubPyfbsdk
+
+'''
+The following functions build a synthetic character.
+'''
+
+# Gets a smooth base layer value with some held (flat) sections, so that some key pairs have no base layer change.
+def GetBaseLayerValue(frame, channelSeed):
+    if (frame // 97 + channelSeed) % 5 == 0:
+        frame = (frame // 97) * 97
+    return 40.0 * math.sin(frame * 0.021 + channelSeed) + 7.0 * math.sin(frame * 0.13 + channelSeed * 3.1)
+
+# Builds a character with effectorCount effectors. Each effector gets a base layer key on every frame from 0 to frameCount, and keyPairCount key pairs on a new additive layer. Returns the character.
+def BuildSyntheticCharacter(pyfbsdk, effectorCount, frameCount, keyPairCount, seed = 0):
+    pyfbsdk.ResetScene()
+    randomGen = random.Random(seed)
+    system = pyfbsdk.FBSystem()
+    take = system.CurrentTake
+    take.LocalTimeSpan = pyfbsdk.FBTimeSpan(pyfbsdk.FBTime(0), pyfbsdk.FBTime(0,0,0,frameCount))
+    take.CreateNewLayer()
+    character = pyfbsdk.FBCharacter("Benchmark_Character")
+    keyFrames = sorted(set([int(round(i * frameCount / float(keyPairCount))) for i in range(keyPairCount + 1)]))
+    for effectorIndex in range(effectorCount):
+        effector = pyfbsdk.FBModelNull("Effector_%s" % (effectorIndex))
+        character.ctrlRigModels[effectorIndex] = effector
+        system.Scene.Components.append(effector)
+        nodes = list(effector.Translation.GetAnimationNode().Nodes) + list(effector.Rotation.GetAnimationNode().Nodes)
+        for channelIndex, node in enumerate(nodes):
+            channelSeed = effectorIndex * 6 + channelIndex
+            take.SetCurrentLayer(0)
+            fcurve = node.FCurve
+            fcurve.frames = list(range(frameCount + 1))
+            fcurve.values = [GetBaseLayerValue(frame, channelSeed) for frame in fcurve.frames]
+            take.SetCurrentLayer(1)
+            fcurve = node.FCurve
+            fcurve.frames = list(keyFrames)
+            fcurve.values = [randomGen.uniform(-10.0, 10.0) for frame in keyFrames]
+    take.SetCurrentLayer(0)
+    system.Scene.Characters.append(character)
+    pyfbsdk.FBApplication().CurrentCharacter = character
+    pyfbsdk.CallCounts.clear()
+    return character
+
+# Gets the frames and values on the additive layer for every effector channel.
+def GetLayerCurves(pyfbsdk, character, layerIndex = 1):
+    take = pyfbsdk.FBSystem().CurrentTake
+    currentLayerIndex = take.currentLayerIndex
+    take.currentLayerIndex = layerIndex
+    curves = []
+    for nodeId in sorted(character.ctrlRigModels):
+        effector = character.ctrlRigModels[nodeId]
+        for node in list(effector.Translation.GetAnimationNode().Nodes) + list(effector.Rotation.GetAnimationNode().Nodes):
+            curves.append([list(node.FCurve.frames), list(node.FCurve.values)])
+    take.currentLayerIndex = currentLayerIndex
+    return curves
+
+'''
+The reference implementation. This is the per key pair, per frame loop from the original AdjustmentBlendObject, kept here so the current version can be checked against it.
+'''
+
+# Adjustment blends an object the way the original AdjustmentBlendObject did.
+def ReferenceAdjustmentBlendObject(obj):
+    from MobuCore.MobuCoreTools.AdjustmentBlend.AdjustmentBlend import FBSystem, GetObjectFCurvesForLayer, GetKeyPairsFromFCurve, EvaluateFCurveForKeyPairTimespan, GetPercentageOfChangeValues
+    take = FBSystem().CurrentTake
+    if take.GetLayerCount() > 1:
+        poseLayerFCurves = GetObjectFCurvesForLayer(obj, take.GetLayerCount()-1)
+        baseLayerFCurves = GetObjectFCurvesForLayer(obj, 0)
+        for i in range(len(poseLayerFCurves)):
+            poseFCurve = poseLayerFCurves[i]
+            keys = poseFCurve.Keys
+            if len(keys) > 1:
+                keyPairsList = GetKeyPairsFromFCurve(keys)
+                for keyPair in keyPairsList:
+                    startValue = keyPair[2]
+                    stopValue = keyPair[3]
+                    spanValues = EvaluateFCurveForKeyPairTimespan(baseLayerFCurves[i], keyPair[0], keyPair[1])
+                    percentageValues, totalBaseLayerChange = GetPercentageOfChangeValues(spanValues)
+                    totalPoseLayerChange = abs(stopValue - startValue)
+                    previousValue = startValue
+                    for value in percentageValues:
+                        valueDelta = (totalPoseLayerChange / 100.0) * value[1]
+                        if stopValue > startValue:
+                            currentValue = previousValue + valueDelta
+                        else:
+                            currentValue = previousValue - valueDelta
+                        poseFCurve.KeyAdd(value[0], currentValue)
+                        previousValue = currentValue
+
+# Adjustment blends a character the way the original AdjustmentBlendCharacter did.
+def ReferenceAdjustmentBlendCharacter(character):
+    from MobuCore.MobuCoreTools.AdjustmentBlend.AdjustmentBlend import GetCharacterEffectorsAndExtensions
+    for obj in GetCharacterEffectorsAndExtensions(character):
+        if obj:
+            ReferenceAdjustmentBlendObject(obj)
+
+'''
+The following functions run the benchmark.
+'''
+
+# Gets the largest difference between two sets of layer curves, or None if they weren't keyed on the same frames.
+def CompareLayerCurves(curves, referenceCurves):
+    largestDifference = 0.0
+    for curve, referenceCurve in zip(curves, referenceCurves):
+        if curve[0] != referenceCurve[0]:
+            return None
+        for value, referenceValue in zip(curve[1], referenceCurve[1]):
+            largestDifference = max(largestDifference, abs(value - referenceValue))
+    return largestDifference
+
+# Times one adjustment blend function on a freshly built character. Returns [seconds, callCounts, layerCurves].
+def TimeAdjustmentBlend(pyfbsdk, blendFunction, effectorCount, frameCount, keyPairCount):
+    character = BuildSyntheticCharacter(pyfbsdk, effectorCount, frameCount, keyPairCount)
+    with contextlib.redirect_stdout(io.StringIO()):
+        startTime = time.perf_counter()
+        blendFunction(character)
+        seconds = time.perf_counter() - startTime
+    callCounts = dict(pyfbsdk.CallCounts)
+    return [seconds, callCounts, GetLayerCurves(pyfbsdk, character)]
+
+# Runs the benchmark for every combination of sizes. Returns a list of result rows, one per implementation and size.
+def RunAdjustmentBlendBenchmark(effectorCounts, frameCounts, keyPairCounts, tolerance = 1e-6, includeReference = True):
+    pyfbsdk = InstallStubPyfbsdk()
+    from MobuCore.MobuCoreTools.AdjustmentBlend.AdjustmentBlend import AdjustmentBlendCharacter
+    rows = []
+    for effectorCount in effectorCounts:
+        for frameCount in frameCounts:
+            for keyPairCount in keyPairCounts:
+                seconds, callCounts, curves = TimeAdjustmentBlend(pyfbsdk, AdjustmentBlendCharacter, effectorCount, frameCount, keyPairCount)
+                row = {"implementation": "current", "effectors": effectorCount, "frames": frameCount, "keyPairs": keyPairCount, "seconds": seconds, "callCounts": callCounts, "difference": None, "matches": None}
+                rows.append(row)
+                if includeReference:
+                    referenceSeconds, referenceCallCounts, referenceCurves = TimeAdjustmentBlend(pyfbsdk, ReferenceAdjustmentBlendCharacter, effectorCount, frameCount, keyPairCount)
+                    rows.append({"implementation": "reference", "effectors": effectorCount, "frames": frameCount, "keyPairs": keyPairCount, "seconds": referenceSeconds, "callCounts": referenceCallCounts, "difference": None, "matches": None})
+                    row["difference"] = CompareLayerCurves(curves, referenceCurves)
+                    row["matches"] = row["difference"] is not None and row["difference"] <= tolerance
+    return rows
+
+# Prints the benchmark results as a table.
+def PrintAdjustmentBlendBenchmark(rows):
+    columns = "%-10s %9s %7s %9s %10s %10s %10s %16s %12s"
+    print(columns % ("impl", "effectors", "frames", "keyPairs", "seconds", "Evaluate", "KeyAdd", "SetCurrentLayer", "difference"))
+    for row in rows:
+        difference = ""
+        if row["implementation"] == "current" and row["matches"] is not None:
+            difference = "%.2e" % (row["difference"]) if row["difference"] is not None else "frames differ"
+        callCounts = row["callCounts"]
+        print(columns % (row["implementation"], row["effectors"], row["frames"], row["keyPairs"], "%.4f" % (row["seconds"]), callCounts.get("Evaluate", 0), callCounts.get("KeyAdd", 0), callCounts.get("SetCurrentLayer", 0), difference))
+
+# Command line entry point.
+def Main(args = None):
+    parser = argparse.ArgumentParser(description = "Benchmarks AdjustmentBlendCharacter against the original per frame implementation, using a stand-in pyfbsdk.")
+    parser.add_argument("--effectors", type = int, nargs = "+", default = [10, 30, 60], help = "Effector counts to benchmark.")
+    parser.add_argument("--frames", type = int, nargs = "+", default = [1000], help = "Frame counts to benchmark.")
+    parser.add_argument("--key-pairs", type = int, nargs = "+", default = [4], help = "Key pairs per channel to benchmark.")
+    parser.add_argument("--tolerance", type = float, default = 1e-6, help = "Largest allowed difference from the reference.")
+    parser.add_argument("--skip-reference", action = "store_true", help = "Only time the current implementation.")
+    args = parser.parse_args(args)
+    rows = RunAdjustmentBlendBenchmark(args.effectors, args.frames, args.key_pairs, args.tolerance, not args.skip_reference)
+    PrintAdjustmentBlendBenchmark(rows)
+    if any([row["matches"] is False for row in rows]):
+        print("Adjustment blend output doesn't match the reference.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(Main())
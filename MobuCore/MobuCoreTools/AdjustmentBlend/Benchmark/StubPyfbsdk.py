@@ -0,0 +1,379 @@
+'''
+A stand-in for pyfbsdk, so that Adjustment Blend can be benchmarked outside of Motionbuilder. It only models what the adjustment blend needs: takes, layers, transform fcurves, characters and their control rig effectors. Time is whole frames only, and fcurves are evaluated with linear interpolation.
+
+Every Evaluate, KeyAdd and SetCurrentLayer call is counted in CallCounts. Any other pyfbsdk name can be imported, but does nothing.
+
+This isn't loaded unless AdjustmentBlendBenchmark.py installs it.
+____________________________________________________________________
+
+This script was written by Dan Lowe as part of the MobuCore package.  You can reach Dan Lowe on Twitter at https://twitter.com/danlowlows (at time of writing, direct messages are open).
+
+MobuCore is made available under the following license terms:
+
+MIT License
+
+Copyright (c) 2023 Dan Lowe
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import bisect
+from collections import Counter
+
+CallCounts = Counter()
+
+'''
+Time. Frames are 30 fps, with Motionbuilder's tick rate. A time set from ticks that aren't on a whole frame keeps a float frame.
+'''
+
+TICKS_PER_FRAME = 46186158000 // 30
+
+class FBTime(object):
+    def __init__(self, hour = 0, minute = 0, second = 0, frame = 0, *args):
+        self.frame = int(frame) + (int(hour) * 3600 + int(minute) * 60 + int(second)) * 30
+    def GetFrame(self, *args):
+        return self.frame
+    def SetFrame(self, frame, *args):
+        self.frame = int(frame)
+    def Get(self):
+        return int(round(self.frame * TICKS_PER_FRAME))
+    def Set(self, ticks):
+        self.frame = ticks // TICKS_PER_FRAME if ticks % TICKS_PER_FRAME == 0 else ticks / float(TICKS_PER_FRAME)
+    def __add__(self, other):
+        return FBTime(0,0,0,self.frame + other.frame)
+    def __sub__(self, other):
+        return FBTime(0,0,0,self.frame - other.frame)
+    def __eq__(self, other):
+        return isinstance(other, FBTime) and self.frame == other.frame
+    def __ne__(self, other):
+        return not self == other
+    def __lt__(self, other):
+        return self.frame < other.frame
+    def __le__(self, other):
+        return self.frame <= other.frame
+    def __gt__(self, other):
+        return self.frame > other.frame
+    def __ge__(self, other):
+        return self.frame >= other.frame
+    def __hash__(self):
+        return hash(self.frame)
+    def __repr__(self):
+        return "FBTime(0,0,0,%s)" % (self.frame)
+
+class FBTimeSpan(object):
+    def __init__(self, start = None, stop = None):
+        self.start = start or FBTime()
+        self.stop = stop or FBTime()
+    def GetStart(self):
+        return self.start
+    def GetStop(self):
+        return self.stop
+    def Set(self, start, stop):
+        self.start = start
+        self.stop = stop
+
+'''
+Fcurves.
+'''
+
+class FBFCurveKey(object):
+    def __init__(self, fcurve, index):
+        self.fcurve = fcurve
+        self.index = index
+    @property
+    def Time(self):
+        time = FBTime()
+        time.frame = self.fcurve.frames[self.index]
+        return time
+    @property
+    def Value(self):
+        return self.fcurve.values[self.index]
+
+class FBFCurveKeyList(object):
+    def __init__(self, fcurve):
+        self.fcurve = fcurve
+    def __len__(self):
+        return len(self.fcurve.frames)
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError(index)
+        return FBFCurveKey(self.fcurve, index)
+    def __iter__(self):
+        for index in range(len(self)):
+            yield FBFCurveKey(self.fcurve, index)
+
+class FBFCurve(object):
+    def __init__(self):
+        self.frames = []
+        self.values = []
+    @property
+    def Keys(self):
+        return FBFCurveKeyList(self)
+    def KeyAdd(self, time, value):
+        CallCounts["KeyAdd"] += 1
+        frame = time.GetFrame()
+        index = bisect.bisect_left(self.frames, frame)
+        if index < len(self.frames) and self.frames[index] == frame:
+            self.values[index] = float(value)
+        else:
+            self.frames.insert(index, frame)
+            self.values.insert(index, float(value))
+        return index
+    def Evaluate(self, time):
+        CallCounts["Evaluate"] += 1
+        frame = time.GetFrame()
+        frames = self.frames
+        if not frames:
+            return 0.0
+        if frame <= frames[0]:
+            return self.values[0]
+        if frame >= frames[-1]:
+            return self.values[-1]
+        index = bisect.bisect_right(frames, frame) - 1
+        if frames[index] == frame:
+            return self.values[index]
+        blend = (frame - frames[index]) / float(frames[index+1] - frames[index])
+        return self.values[index] + (self.values[index+1] - self.values[index]) * blend
+    def EditBegin(self, *args):
+        CallCounts["EditBegin"] += 1
+    def EditEnd(self, *args):
+        CallCounts["EditEnd"] += 1
+    def EditClear(self):
+        self.frames = []
+        self.values = []
+
+'''
+Properties and animation nodes. Each animation node holds one fcurve per take and layer, and returns the one for the current take and layer.
+'''
+
+class FBAnimationNode(object):
+    def __init__(self, name, childNames = ()):
+        self.Name = name
+        self.Nodes = [FBAnimationNode(childName) for childName in childNames]
+        self.fcurves = {}
+    @property
+    def FCurve(self):
+        take = FBSystem().CurrentTake
+        fcurveKey = (id(take), take.GetCurrentLayer())
+        if fcurveKey not in self.fcurves:
+            self.fcurves[fcurveKey] = FBFCurve()
+        return self.fcurves[fcurveKey]
+
+class FBProperty(object):
+    def __init__(self, owner, name, animated = False):
+        self.owner = owner
+        self.name = name
+        self.Data = None
+        self.animationNode = FBAnimationNode(name, ["X", "Y", "Z"]) if animated else None
+    @property
+    def Name(self):
+        return self.name
+    @Name.setter
+    def Name(self, name):
+        self.owner.PropertyList.Rename(self.name, name)
+        self.name = name
+    def GetAnimationNode(self):
+        return self.animationNode
+    def SetAnimated(self, animated):
+        pass
+    def IsAnimated(self):
+        return self.animationNode is not None
+
+class FBPropertyList(object):
+    def __init__(self, owner):
+        self.owner = owner
+        self.properties = {}
+    def Add(self, prop):
+        self.properties[prop.Name] = prop
+        return prop
+    def Rename(self, oldName, newName):
+        self.properties[newName] = self.properties.pop(oldName)
+    def Find(self, name):
+        return self.properties.get(name)
+
+class FBPropertyListObject(list):
+    def __init__(self, name, objs = ()):
+        list.__init__(self, objs)
+        self.Name = name
+
+class FBComponent(object):
+    def __init__(self, name = ""):
+        self.Name = name
+        self.LongName = name
+        self.Selected = False
+        self.PropertyList = FBPropertyList(self)
+    def PropertyCreate(self, name, *args):
+        return self.PropertyList.Add(FBProperty(self, name))
+    def FBDelete(self):
+        pass
+
+class FBModel(FBComponent):
+    def __init__(self, name = ""):
+        FBComponent.__init__(self, name)
+        self.Parent = None
+        self.Children = []
+        self.Translation = self.PropertyList.Add(FBProperty(self, "Lcl Translation", True))
+        self.Rotation = self.PropertyList.Add(FBProperty(self, "Lcl Rotation", True))
+        self.Scaling = self.PropertyList.Add(FBProperty(self, "Lcl Scaling", True))
+
+class FBModelNull(FBModel):
+    pass
+
+class FBModelMarker(FBModel):
+    pass
+
+'''
+Takes and layers.
+'''
+
+class FBAnimationLayer(FBComponent):
+    def __init__(self, name, take):
+        FBComponent.__init__(self, name)
+        self.take = take
+        self.Mute = False
+        self.Weight = 100.0
+    def GetLayerIndex(self):
+        return self.take.layers.index(self)
+
+class FBTake(FBComponent):
+    def __init__(self, name = "Take 001"):
+        FBComponent.__init__(self, name)
+        self.layers = [FBAnimationLayer("BaseAnimation", self)]
+        self.currentLayerIndex = 0
+        self.LocalTimeSpan = FBTimeSpan(FBTime(0), FBTime(0,0,0,100))
+    def GetLayerCount(self):
+        return len(self.layers)
+    def GetLayer(self, index):
+        return self.layers[index]
+    def GetLayerByName(self, name):
+        for layer in self.layers:
+            if layer.Name == name:
+                return layer
+    def GetCurrentLayer(self):
+        return self.currentLayerIndex
+    def SetCurrentLayer(self, index):
+        CallCounts["SetCurrentLayer"] += 1
+        self.currentLayerIndex = index
+    def CreateNewLayer(self):
+        self.layers.append(FBAnimationLayer("AnimLayer%s" % (len(self.layers)), self))
+        return self.layers[-1]
+
+'''
+Characters. Only FK effectors are modelled, and characters don't have a control set, so there are no IK effectors.
+'''
+
+class FBBodyNodeId(object):
+    kFBInvalidNodeId = -1
+    kFBLastNodeId = 1000
+    values = dict([(i, i) for i in range(kFBLastNodeId)] + [(-1, kFBInvalidNodeId), (kFBLastNodeId, kFBLastNodeId)])
+
+class FBEffectorId(object):
+    kFBInvalidEffectorId = -1
+    kFBLastEffectorId = 0
+    values = {-1: kFBInvalidEffectorId, 0: kFBLastEffectorId}
+
+class FBCharacter(FBComponent):
+    def __init__(self, name = "Character"):
+        FBComponent.__init__(self, name)
+        self.ctrlRigModels = {}
+        self.PropertyList.Add(FBPropertyListObject("ControlSet"))
+    def GetCtrlRigModel(self, nodeId):
+        return self.ctrlRigModels.get(nodeId)
+
+'''
+System and scene.
+'''
+
+class FBScene(object):
+    def __init__(self):
+        self.Components = []
+        self.Takes = [FBTake()]
+        self.Characters = []
+        self.CharacterExtensions = []
+    def Evaluate(self):
+        pass
+
+class FBSystem(object):
+    scene = None
+    currentTake = None
+    def __init__(self):
+        if not FBSystem.scene:
+            ResetScene()
+    @property
+    def Scene(self):
+        return FBSystem.scene
+    @property
+    def CurrentTake(self):
+        return FBSystem.currentTake
+    @CurrentTake.setter
+    def CurrentTake(self, take):
+        FBSystem.currentTake = take
+
+class FBApplication(object):
+    currentCharacter = None
+    @property
+    def CurrentCharacter(self):
+        return FBApplication.currentCharacter
+    @CurrentCharacter.setter
+    def CurrentCharacter(self, character):
+        FBApplication.currentCharacter = character
+
+# Clears the scene, the current character and the call counts.
+def ResetScene():
+    FBSystem.scene = FBScene()
+    FBSystem.currentTake = FBSystem.scene.Takes[0]
+    FBApplication.currentCharacter = None
+    CallCounts.clear()
+
+def FBMessageBox(*args):
+    print("FBMessageBox: %s" % (" ".join([str(arg) for arg in args])))
+    return 1
+
+def FBBeginChangeAllModels():
+    CallCounts["FBBeginChangeAllModels"] += 1
+
+def FBEndChangeAllModels():
+    CallCounts["FBEndChangeAllModels"] += 1
+
+'''
+Everything else that's imported from pyfbsdk is a placeholder that does nothing.
+'''
+
+class FBPlaceholderType(type):
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return name
+
+class FBPlaceholder(object, metaclass = FBPlaceholderType):
+    def __init__(self, *args, **kwargs):
+        pass
+    def __getattr__(self, name):
+        return FBPlaceholder()
+    def __call__(self, *args, **kwargs):
+        return FBPlaceholder()
+
+def __getattr__(name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    placeholder = FBPlaceholderType(name, (FBPlaceholder,), {})
+    globals()[name] = placeholder
+    return placeholder
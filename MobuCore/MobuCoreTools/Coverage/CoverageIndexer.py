@@ -0,0 +1,133 @@
+'''
+Builds a mocap coverage table (see CoverageTable.py) for the takes in a scene, or for every scene in a folder, and saves it to disk, so coverage can be queried without opening the scenes again. Each take's root trajectory is sampled once (see Kinematics.py), from the current character's hips effector unless another object is given. The root's evaluated global translation is sampled, so every layer is included whichever layer is current.
+
+Scenes that were indexed before and haven't been modified since are skipped when indexing a folder.
+
+NumPy and MobuCoreLibrary functions are required for this script.
+____________________________________________________________________
+
+This script was written by Dan Lowe as part of the MobuCore package.  You can reach Dan Lowe on Twitter at https://twitter.com/danlowlows (at time of writing, direct messages are open).
+
+MobuCore is made available under the following license terms:
+
+MIT License
+
+Copyright (c) 2023 Dan Lowe
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+from pyfbsdk import FBSystem, FBApplication, FBBodyNodeId, FBMessageBox
+import os
+from MobuCore.MobuCoreLibrary.MobuCoreLibrary import GetMBDirectory, RunForTakes, PrintTakeBatchReport, GetStartAndEndTimes, GetFilePaths
+from MobuCore.MobuCoreTools.Kinematics.Kinematics import SampleTranslations, GetFrameRate, GetTranslationFCurves
+from MobuCore.MobuCoreTools.Coverage.CoverageTable import GetCoverageRows, LoadCoverageTable
+
+# Gets the default coverage table file path.
+def GetCoverageTablePath():
+    return GetMBDirectory() + "MobuCoreCoverage.npz"
+
+# Gets the key used for a scene file in the coverage table, so that the same file always gets the same key however its path is written.
+def GetCoverageSceneKey(sceneFile):
+    if not sceneFile:
+        return ""
+    return os.path.normcase(os.path.abspath(sceneFile))
+
+# Checks if an object has translation keys on the current take.
+def HasTranslationKeys(obj):
+    fcurves = GetTranslationFCurves(obj)
+    return bool(fcurves) and any(len(fcurve.Keys) > 0 for fcurve in fcurves)
+
+# Gets the object to use as a character's root on the current take. This is the hips effector if the control rig is animated on the take, otherwise the hips skeleton node.
+def GetCoverageRootObject(character = None):
+    if not character:
+        character = FBApplication().CurrentCharacter
+    if character:
+        ctrlRigRoot = character.GetCtrlRigModel(FBBodyNodeId.kFBHipsNodeId)
+        if ctrlRigRoot and HasTranslationKeys(ctrlRigRoot):
+            return ctrlRigRoot
+        return character.GetModel(FBBodyNodeId.kFBHipsNodeId) or ctrlRigRoot
+
+# Gets the coverage rows for the current take.
+def GetTakeCoverageRows(rootObj, sceneFile = "", sceneModifiedTime = 0.0):
+    take = FBSystem().CurrentTake
+    startFrame = GetStartAndEndTimes(take)[0]
+    frames, positions = SampleTranslations([rootObj], globalSpace = True)
+    return GetCoverageRows(positions[:, 0, :], GetFrameRate(), startFrame, sceneFile, take.Name, rootObj.LongName, sceneModifiedTime)
+
+# Indexes the takes in the current scene (or a list of takes), replacing any rows the table already has for them. If no root object is given, the current character's root is worked out for each take. Returns the take batch report.
+def IndexSceneCoverage(table, rootObj = None, takes = None, progressCallback = None, cancelCallback = None):
+    if not rootObj and not GetCoverageRootObject():
+        print("Coverage indexing needs a root object, or a current character.")
+        return []
+    sceneFile = FBApplication().FBXFileName or ""
+    sceneModifiedTime = os.path.getmtime(sceneFile) if sceneFile and os.path.isfile(sceneFile) else 0.0
+    sceneFile = GetCoverageSceneKey(sceneFile)
+    if takes is None:
+        takes = list(FBSystem().Scene.Takes)
+
+    def IndexTake(take):
+        rows = GetTakeCoverageRows(rootObj or GetCoverageRootObject(), sceneFile, sceneModifiedTime)
+        table.RemoveRows(sceneFile, take.Name)
+        table.AddRows(rows)
+
+    return RunForTakes(takes, IndexTake, progressCallback, cancelCallback)
+
+# Asks whether to save the current scene before it's closed. Returns False if the user cancels, or the scene couldn't be saved.
+def ConfirmCloseScene():
+    result = FBMessageBox("Warning...", "Indexing a folder opens each scene in it, which closes the current scene. Save the current scene first?", "Save", "Don't Save", "Cancel")
+    if result == 1:
+        if not FBApplication().FileSave():
+            print("Couldn't save the current scene, so coverage indexing was cancelled.")
+            return False
+        return True
+    return result == 2
+
+# Indexes every .fbx scene in a folder (including sub-folders), opening each one. Scenes that haven't changed since they were indexed are skipped. The table is saved after each scene. Unless confirm is False, asks whether to save the current scene first, as opening the scenes closes it. Returns the table, or None if cancelled.
+def IndexFolderCoverage(folderPath, tablePath = None, confirm = True):
+    if confirm and not ConfirmCloseScene():
+        return None
+    if not tablePath:
+        tablePath = GetCoverageTablePath()
+    table = LoadCoverageTable(tablePath)
+    for sceneFile in GetFilePaths(folderPath, [".fbx"]):
+        sceneKey = GetCoverageSceneKey(sceneFile)
+        if table.GetSceneModifiedTime(sceneKey) == os.path.getmtime(sceneFile):
+            continue
+        if not FBApplication().FileOpen(sceneFile, False):
+            print("Couldn't open %s" % (sceneFile))
+        elif not GetCoverageRootObject():
+            print("Skipped %s, as it has no current character." % (sceneFile))
+        else:
+            table.RemoveRows(sceneKey)
+            PrintTakeBatchReport(IndexSceneCoverage(table))
+            table.Save(tablePath)
+    return table
+
+# Indexes the takes in the current scene and saves them to the default coverage table.
+def IndexCurrentSceneCoverage():
+    if not GetCoverageRootObject():
+        FBMessageBox("Error...", "No current character found. Coverage is worked out from the character's hips.", "OK")
+        return None
+    tablePath = GetCoverageTablePath()
+    table = LoadCoverageTable(tablePath)
+    PrintTakeBatchReport(IndexSceneCoverage(table))
+    table.Save(tablePath)
+    print("Coverage table saved to %s (%s rows)." % (tablePath, table.GetRowCount()))
+    return table
@@ -0,0 +1,207 @@
+'''
+Mocap coverage table and query engine. Holds motion features for takes (and the moving segments within them) as columns, saves and loads them as a single file, and answers range queries on any feature, e.g. walks at 1.4-1.8 m/s heading 45 degrees, using a sorted copy of each column.
+
+The features for a take come from its root trajectory (see GetCoverageRows): duration in seconds, travel distance (start to end) and path length in meters, speed (travel distance over duration, same as GetSpeed) and average speed (path length over duration) in meters per second, and heading, which is the world space angle of the travel direction (measured from +Z, negative when moving towards -X, same as GetWorldSpaceAngleToObj), plus the heading bucket, which is the closest of the default coverage angles (see GetClosestValue). Takes and segments where the root doesn't travel (its speed is below the stop speed) have no heading, so their heading and heading bucket are NaN and they don't match any heading query. Each take gets a "take" row for the whole take, and a "segment" row for each run of frames where the root is moving.
+
+NumPy is required for this script. It doesn't import pyfbsdk.
+____________________________________________________________________
+
+This script was written by Dan Lowe as part of the MobuCore package.  You can reach Dan Lowe on Twitter at https://twitter.com/danlowlows (at time of writing, direct messages are open).
+
+MobuCore is made available under the following license terms:
+
+MIT License
+
+Copyright (c) 2023 Dan Lowe
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import os
+import numpy as np
+from MobuCore.MobuCoreTools.Kinematics.KinematicsMath import GetSpeeds, GetPathLengths, GetMovingRuns
+from MobuCore.MobuCoreLibrary.VectorMath import GetWorldSpaceAngles
+
+TEXT_COLUMNS = ["sceneFile", "takeName", "objectName", "rowType"]
+NUMBER_COLUMNS = ["sceneModifiedTime", "startFrame", "stopFrame", "duration", "travelDistance", "pathLength", "speed", "averageSpeed", "heading", "headingBucket"]
+HEADING_BUCKETS = [0, -45, 45, -90, 90, -135, 135, 180]
+
+'''
+The following functions work out the coverage features from a trajectory.
+'''
+
+# Gets the closest coverage heading for each heading. -180 is the same as 180, so it's reported as 180.
+def GetHeadingBuckets(headings, buckets = None):
+    if buckets is None:
+        buckets = HEADING_BUCKETS
+    headings = np.asarray(headings, dtype = np.float64)
+    buckets = np.asarray(buckets, dtype = np.float64)
+    differences = np.abs((headings[:, None] - buckets[None, :] + 180.0) % 360.0 - 180.0)
+    return buckets[np.argmin(differences, axis = 1)]
+
+# Gets the features for the frames between two sample indices of a (frames x 3) trajectory. If the speed is below stopSpeed, the heading and heading bucket are NaN.
+def GetTrajectoryFeatures(positions, fps, startIndex, stopIndex, stopSpeed = 0.1):
+    positions = positions[startIndex:stopIndex + 1]
+    duration = max(stopIndex - startIndex, 1) / float(fps)
+    travel = (positions[-1] - positions[0]) * 0.01
+    travelDistance = float(np.linalg.norm(travel))
+    pathLength = float(GetPathLengths(positions[:, None, :], 0.01)[0])
+    speed = travelDistance / duration
+    if speed >= stopSpeed and travelDistance > 0:
+        heading = float(GetWorldSpaceAngles(travel * [1, 0, 1])[0])
+        headingBucket = float(GetHeadingBuckets([heading])[0])
+    else:
+        heading = headingBucket = float("nan")
+    return {"duration": duration, "travelDistance": travelDistance, "pathLength": pathLength, "speed": speed, "averageSpeed": pathLength / duration, "heading": heading, "headingBucket": headingBucket}
+
+# Gets the coverage rows for a take from its root trajectory, a (frames x 3) array sampled once per frame from startFrame. stopSpeed is the speed in meters per second below which the root counts as stopped, and segments shorter than minSegmentFrames are left out.
+def GetCoverageRows(positions, fps, startFrame, sceneFile = "", takeName = "", objectName = "", sceneModifiedTime = 0.0, stopSpeed = 0.1, minSegmentFrames = 10):
+    positions = np.asarray(positions, dtype = np.float64).reshape(-1, 3)
+    rowInfo = {"sceneFile": sceneFile, "takeName": takeName, "objectName": objectName, "sceneModifiedTime": sceneModifiedTime}
+    rows = []
+    spans = [["take", 0, len(positions) - 1]]
+    if len(positions) > 1:
+        speeds = GetSpeeds(positions[:, None, :], fps, 0.01)
+        for startIndex, stopIndex in GetMovingRuns(speeds, stopSpeed, minSegmentFrames)[0]:
+            spans.append(["segment", startIndex, stopIndex])
+    for rowType, startIndex, stopIndex in spans:
+        row = dict(rowInfo)
+        row.update(GetTrajectoryFeatures(positions, fps, startIndex, stopIndex, stopSpeed))
+        row.update({"rowType": rowType, "startFrame": startFrame + startIndex, "stopFrame": startFrame + stopIndex})
+        rows.append(row)
+    return rows
+
+'''
+The following are for storing and querying coverage rows.
+'''
+
+class CoverageTable(object):
+    def __init__(self, columns = None):
+        self.columns = {}
+        for name in TEXT_COLUMNS:
+            self.columns[name] = np.asarray(columns[name], dtype = str) if columns else np.zeros(0, dtype = str)
+        for name in NUMBER_COLUMNS:
+            self.columns[name] = np.asarray(columns[name], dtype = np.float64) if columns else np.zeros(0)
+        self.sortedColumns = {}
+
+    # Gets the number of rows.
+    def GetRowCount(self):
+        return len(self.columns["rowType"])
+
+    # Adds a list of rows (dictionaries with a value for every column).
+    def AddRows(self, rows):
+        if rows:
+            for name in TEXT_COLUMNS:
+                self.columns[name] = np.concatenate([self.columns[name], np.asarray([str(row[name]) for row in rows], dtype = str)])
+            for name in NUMBER_COLUMNS:
+                self.columns[name] = np.concatenate([self.columns[name], np.asarray([row[name] for row in rows], dtype = np.float64)])
+            self.sortedColumns = {}
+
+    # Removes the rows for a scene file, or just for one take in it.
+    def RemoveRows(self, sceneFile, takeName = None):
+        remove = self.columns["sceneFile"] == sceneFile
+        if takeName is not None:
+            remove &= self.columns["takeName"] == takeName
+        if remove.any():
+            for name in self.columns:
+                self.columns[name] = self.columns[name][~remove]
+            self.sortedColumns = {}
+
+    # Gets the modified time that a scene file had when it was indexed, or None if it hasn't been indexed.
+    def GetSceneModifiedTime(self, sceneFile):
+        rowIndices = np.flatnonzero(self.columns["sceneFile"] == sceneFile)
+        if len(rowIndices):
+            return float(self.columns["sceneModifiedTime"][rowIndices[0]])
+
+    # Gets a column's values sorted, and the row index for each sorted value. Sorted once, then reused until the rows change.
+    def GetSortedColumn(self, name):
+        if name not in self.sortedColumns:
+            order = np.argsort(self.columns[name], kind = "stable")
+            self.sortedColumns[name] = [self.columns[name][order], order]
+        return self.sortedColumns[name]
+
+    # Gets the rows where a number column is between low and high (inclusive).
+    def GetRowsInRange(self, name, low, high):
+        sortedValues, order = self.GetSortedColumn(name)
+        return order[np.searchsorted(sortedValues, low, "left"):np.searchsorted(sortedValues, high, "right")]
+
+    # Gets the indices of the rows that match every filter. A filter for a number column is a value, a (low, high) range, or a list of ranges (matching any of them). A filter for a text column is a value or a list of values.
+    def QueryIndices(self, **filters):
+        mask = np.ones(self.GetRowCount(), dtype = bool)
+        for name, value in filters.items():
+            if name not in self.columns:
+                raise ValueError("Unknown coverage column: %s" % (name))
+            if name in TEXT_COLUMNS:
+                values = [value] if isinstance(value, str) else list(value)
+                mask &= np.isin(self.columns[name], values)
+            else:
+                ranges = value if isinstance(value, list) else [value]
+                columnMask = np.zeros(self.GetRowCount(), dtype = bool)
+                for valueRange in ranges:
+                    low, high = valueRange if isinstance(valueRange, tuple) else (valueRange, valueRange)
+                    columnMask[self.GetRowsInRange(name, low, high)] = True
+                mask &= columnMask
+        return np.flatnonzero(mask)
+
+    # Gets the rows that match every filter (see QueryIndices), as a list of dictionaries.
+    def Query(self, **filters):
+        return self.GetRows(self.QueryIndices(**filters))
+
+    # Gets rows as a list of dictionaries.
+    def GetRows(self, rowIndices):
+        rows = []
+        for rowIndex in rowIndices:
+            row = {}
+            for name in TEXT_COLUMNS:
+                row[name] = str(self.columns[name][rowIndex])
+            for name in NUMBER_COLUMNS:
+                row[name] = float(self.columns[name][rowIndex])
+            rows.append(row)
+        return rows
+
+    # Saves the table to a file (.npz).
+    def Save(self, filePath):
+        folderPath = os.path.dirname(filePath)
+        if folderPath and not os.path.exists(folderPath):
+            os.makedirs(folderPath)
+        tempPath = filePath + ".tmp.npz"
+        np.savez(tempPath, **self.columns)
+        if hasattr(os, "replace"):
+            os.replace(tempPath, filePath)
+        else:
+            if os.path.exists(filePath):
+                os.remove(filePath)
+            os.rename(tempPath, filePath)
+
+# Loads a coverage table from a file, or returns an empty table if the file doesn't exist.
+def LoadCoverageTable(filePath):
+    if not os.path.isfile(filePath):
+        return CoverageTable()
+    with np.load(filePath, allow_pickle = False) as data:
+        return CoverageTable(dict([[name, data[name]] for name in TEXT_COLUMNS + NUMBER_COLUMNS]))
+
+# Gets the heading ranges for a heading plus or minus a tolerance, split in two where they wrap around 180, for use as a heading filter.
+def GetHeadingRanges(heading, tolerance):
+    low = (heading - tolerance + 180.0) % 360.0 - 180.0
+    high = (heading + tolerance + 180.0) % 360.0 - 180.0
+    if tolerance >= 180.0:
+        return [(-180.0, 180.0)]
+    if low <= high:
+        return [(low, high)]
+    return [(low, 180.0), (-180.0, high)]
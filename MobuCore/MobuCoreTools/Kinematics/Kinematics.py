@@ -0,0 +1,100 @@
+'''
+Trajectory kinematics for objects in Motionbuilder. Samples the translation of a list of objects once, for every frame of a take, into a (frames x objects x 3) NumPy array, then works out per frame speed, acceleration and heading, path length, and when each object starts and stops moving (see KinematicsMath.py), using the scene's frame rate.
+
+By default, translations are sampled by moving the timeline to each frame and reading the evaluated translation, so layers and constraints are included. Evaluating the translation curves directly is much faster, and can be asked for when only the current layer's local curves matter.
+
+NumPy and MobuCoreLibrary functions are required for this script.
+____________________________________________________________________
+
+This script was written by Dan Lowe as part of the MobuCore package.  You can reach Dan Lowe on Twitter at https://twitter.com/danlowlows (at time of writing, direct messages are open).
+
+MobuCore is made available under the following license terms:
+
+MIT License
+
+Copyright (c) 2023 Dan Lowe
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+from pyfbsdk import FBTime, FBPlayerControl, FBSystem
+import numpy as np
+from MobuCore.MobuCoreLibrary.MobuCoreLibrary import GetStartAndEndTimes, GetGlobalTranslation
+from MobuCore.MobuCoreTools.Kinematics.KinematicsMath import GetTrajectoryMetrics
+
+'''
+The following functions are for sampling translations.
+'''
+
+# Gets the scene's frame rate.
+def GetFrameRate():
+    return FBPlayerControl().GetTransportFpsValue()
+
+# Gets an object's local translation FCurves on the current animation layer, or None if it doesn't have them.
+def GetTranslationFCurves(obj):
+    animNode = obj.PropertyList.Find("Lcl Translation").GetAnimationNode()
+    if animNode:
+        nodes = animNode.Nodes
+        if len(nodes) == 3:
+            return [node.FCurve for node in nodes]
+
+# Samples the translation of each object on every frame from startFrame to stopFrame (defaulting to the current take's time span). The timeline is moved to each frame and the evaluated translation is read, in local space, or global space if globalSpace is True. If fromCurves is True, the local translation curves are evaluated directly instead, which is much faster but only includes the current layer and not constraints; it's only used for local space, on takes with one layer, for objects with translation curves. Returns the frames, and a (frames x objects x 3) array of translations.
+def SampleTranslations(objList, startFrame = None, stopFrame = None, globalSpace = False, fromCurves = False):
+    if not isinstance(objList, list):
+        objList = [objList]
+    if startFrame is None or stopFrame is None:
+        startEndTimes = GetStartAndEndTimes()
+        if startFrame is None:
+            startFrame = startEndTimes[0]
+        if stopFrame is None:
+            stopFrame = startEndTimes[1]
+    frames = np.arange(startFrame, stopFrame + 1)
+    positions = np.empty((len(frames), len(objList), 3))
+    useCurves = fromCurves and not globalSpace and FBSystem().CurrentTake.GetLayerCount() == 1
+    evaluatedObjIndices = []
+    time = FBTime(0,0,0,startFrame)
+    for objIndex, obj in enumerate(objList):
+        fcurves = GetTranslationFCurves(obj) if useCurves else None
+        if fcurves:
+            for axis, fcurve in enumerate(fcurves):
+                column = positions[:, objIndex, axis]
+                for frameIndex, frame in enumerate(frames.tolist()):
+                    time.SetFrame(frame)
+                    column[frameIndex] = fcurve.Evaluate(time)
+        else:
+            evaluatedObjIndices.append(objIndex)
+    if evaluatedObjIndices:
+        playerControl = FBPlayerControl()
+        for frameIndex, frame in enumerate(frames.tolist()):
+            playerControl.Goto(FBTime(0,0,0,frame))
+            for objIndex in evaluatedObjIndices:
+                obj = objList[objIndex]
+                translation = GetGlobalTranslation(obj) if globalSpace else obj.Translation
+                positions[frameIndex, objIndex, :] = [translation[0], translation[1], translation[2]]
+    return frames, positions
+
+'''
+The following functions get kinematics for objects.
+'''
+
+# Gets the trajectory metrics for a list of objects over a frame range (defaulting to the current take's time span). Speeds are in units per second, multiplied by unitScale (e.g. 0.01 for meters per second). stopThreshold is the speed, in units per second before scaling, below which an object counts as stopped. globalSpace and fromCurves are passed on to SampleTranslations. Returns [frames, positions, metrics], where metrics is the dictionary from KinematicsMath.GetTrajectoryMetrics.
+def GetTrajectoryKinematics(objList, startFrame = None, stopFrame = None, unitScale = 1.0, stopThreshold = 10.0, minMovingFrames = 1, globalSpace = False, fromCurves = False):
+    frames, positions = SampleTranslations(objList, startFrame, stopFrame, globalSpace, fromCurves)
+    metrics = GetTrajectoryMetrics(positions, GetFrameRate(), unitScale, stopThreshold, minMovingFrames)
+    return [frames, positions, metrics]
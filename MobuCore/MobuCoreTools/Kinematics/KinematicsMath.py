@@ -0,0 +1,112 @@
+'''
+Array math for trajectory kinematics. Works on a (frames x objects x 3) array of positions, sampled one frame apart, and gets per frame speed, acceleration and heading, path length, and when each object starts and stops moving. Positions are in Motionbuilder units (centimeters), and speeds are in units per second unless a unit scale is given (e.g. 0.01 for meters per second).
+
+NumPy is required for this script. It doesn't import pyfbsdk.
+____________________________________________________________________
+
+This script was written by Dan Lowe as part of the MobuCore package.  You can reach Dan Lowe on Twitter at https://twitter.com/danlowlows (at time of writing, direct messages are open).
+
+MobuCore is made available under the following license terms:
+
+MIT License
+
+Copyright (c) 2023 Dan Lowe
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import numpy as np
+
+'''
+The following functions get per frame metrics. Velocities use central differences (one sided at the first and last frame), so they line up with the sampled frames.
+'''
+
+# Gets the velocity of each object on each frame, as a (frames x objects x 3) array.
+def GetVelocities(positions, fps, unitScale = 1.0):
+    positions = np.asarray(positions, dtype = np.float64)
+    if len(positions) < 2:
+        return np.zeros_like(positions)
+    return np.gradient(positions, axis = 0) * (fps * unitScale)
+
+# Gets the speed of each object on each frame, as a (frames x objects) array.
+def GetSpeeds(positions, fps, unitScale = 1.0):
+    return np.linalg.norm(GetVelocities(positions, fps, unitScale), axis = 2)
+
+# Gets the acceleration (the rate of change of velocity, as a length) of each object on each frame, as a (frames x objects) array.
+def GetAccelerations(positions, fps, unitScale = 1.0):
+    velocities = GetVelocities(positions, fps, unitScale)
+    if len(velocities) < 2:
+        return np.zeros(velocities.shape[:2])
+    return np.linalg.norm(np.gradient(velocities, axis = 0) * fps, axis = 2)
+
+# Gets the heading of each object on each frame in degrees, as a (frames x objects) array. The heading is the direction of movement on the ground plane (X and Z, with Y up), where 0 is +Z and 90 is +X. Frames where an object isn't moving on the ground plane get NaN.
+def GetHeadings(positions, fps):
+    velocities = GetVelocities(positions, fps)
+    headings = np.degrees(np.arctan2(velocities[:, :, 0], velocities[:, :, 2]))
+    headings[np.hypot(velocities[:, :, 0], velocities[:, :, 2]) < 1e-9] = np.nan
+    return headings
+
+# Gets the total distance travelled by each object, following its path frame to frame, as an array with one value per object.
+def GetPathLengths(positions, unitScale = 1.0):
+    positions = np.asarray(positions, dtype = np.float64)
+    if len(positions) < 2:
+        return np.zeros(positions.shape[1])
+    return np.linalg.norm(np.diff(positions, axis = 0), axis = 2).sum(axis = 0) * unitScale
+
+# Gets the straight line distance between the first and last frame for each object.
+def GetDisplacements(positions, unitScale = 1.0):
+    positions = np.asarray(positions, dtype = np.float64)
+    return np.linalg.norm(positions[-1] - positions[0], axis = 1) * unitScale
+
+# Gets the speed for each object assuming it moved in a straight line from its first frame to its last frame.
+def GetStraightLineSpeeds(positions, fps, unitScale = 1.0):
+    positions = np.asarray(positions, dtype = np.float64)
+    frameCount = len(positions) - 1
+    if frameCount < 1:
+        return np.zeros(positions.shape[1])
+    return GetDisplacements(positions, unitScale) / frameCount * fps
+
+'''
+The following functions are for working out when objects are moving.
+'''
+
+# Gets the runs of frames where each object is moving faster than a threshold speed. Runs shorter than minFrames are ignored. Returns a list (one per object) of [startFrameIndex, stopFrameIndex] runs, where the stop index is the last moving frame.
+def GetMovingRuns(speeds, threshold, minFrames = 1):
+    speeds = np.asarray(speeds, dtype = np.float64)
+    movingRuns = []
+    for objIndex in range(speeds.shape[1]):
+        moving = np.concatenate([[False], speeds[:, objIndex] > threshold, [False]])
+        changes = np.flatnonzero(moving[1:] != moving[:-1])
+        runs = [[int(start), int(stop) - 1] for start, stop in zip(changes[0::2], changes[1::2]) if stop - start >= minFrames]
+        movingRuns.append(runs)
+    return movingRuns
+
+# Gets every metric for a (frames x objects x 3) positions array. Returns a dictionary of arrays: speed, acceleration and heading are (frames x objects), pathLength, displacement and straightLineSpeed have one value per object, and movingRuns is a list of runs per object (see GetMovingRuns).
+def GetTrajectoryMetrics(positions, fps, unitScale = 1.0, stopThreshold = 10.0, minMovingFrames = 1):
+    positions = np.asarray(positions, dtype = np.float64)
+    speeds = GetSpeeds(positions, fps, unitScale)
+    return {
+        "speed": speeds,
+        "acceleration": GetAccelerations(positions, fps, unitScale),
+        "heading": GetHeadings(positions, fps),
+        "pathLength": GetPathLengths(positions, unitScale),
+        "displacement": GetDisplacements(positions, unitScale),
+        "straightLineSpeed": GetStraightLineSpeeds(positions, fps, unitScale),
+        "movingRuns": GetMovingRuns(speeds, stopThreshold * unitScale, minMovingFrames),
+    }
@@ -31,22 +31,212 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 '''
 
-from pyfbsdk import FBStory, FBStoryTrack, FBStoryTrackType, FBTime, FBVector3d, FBSystem, FBCharacterPlotWhere
-from MobuCore.MobuCoreLibrary.MobuCoreLibrary import CreateNewTake, PlotToCharacter
+from pyfbsdk import FBStory, FBStoryTrack, FBStoryTrackType, FBTime, FBVector3d, FBSystem, FBCharacterPlotWhere, FBApplication, FBStoryClip, FBStoryFolder, FBSceneChangeType
+from MobuCore.MobuCoreLibrary.MobuCoreLibrary import CreateNewTake, PlotToCharacter, GetMBDirectory, RunForTakes, TakeBatchProgress, PrintTakeBatchReport
+import os
+import json
 
-# Gets the selected Story clips from the Story Editor.
+'''
+The following are for querying Story clips by time and selection. A Story snapshot reads every track in the Story, including tracks in sub-folders, and keeps an interval tree of clip start and stop frames for each character, so that finding the clips that overlap a frame range doesn't need to go through every clip.
+
+The snapshot is refreshed when it's used after Story clips, tracks or folders have changed (or every time it's used, if the scene change callback can't be registered), and is cleared when a file is opened or a new scene is started. The clips a query finds have their times checked against the snapshot, and if any have been retimed without a scene change event, the snapshot is refreshed and the query is run again. Refreshing reads the clip times again, but only rebuilds the interval trees for characters whose clips have changed. Selection isn't kept in the snapshot; it's always read from the clips.
+
+Each clip entry is [track, clip, startFrame, stopFrame]. Tracks without a character are grouped under the character key "".
+'''
+
+# Yields every track in the Story, including tracks in sub-folders. Sub-folder tracks come before a folder's own tracks, so tracks added to the root folder don't change the order of the tracks before them.
+def IterStoryTracks(folder = None):
+    if not folder:
+        folder = FBStory().RootFolder
+    stack = [[folder, False]]
+    while stack:
+        folder, childrenDone = stack.pop()
+        if childrenDone:
+            for track in folder.Tracks:
+                yield track
+        else:
+            stack.append([folder, True])
+            for childFolder in reversed(list(folder.Childs)):
+                stack.append([childFolder, False])
+
+# Gets the character key for a track.
+def GetStoryTrackCharacterKey(track):
+    character = track.Character
+    return character.LongName if character else ""
+
+class StoryClipIntervalTree(object):
+    def __init__(self, entries):
+        self.entries = sorted(entries, key = lambda entry: entry[2])
+        self.starts = [entry[2] for entry in self.entries]
+        self.maxStops = [entry[3] for entry in self.entries]
+        self.BuildMaxStops(0, len(self.entries))
+
+    # Sets the max stop frame for each node. The tree is implicit: the node for a range of entries is the middle entry, and its children are the middles of the halves either side.
+    def BuildMaxStops(self, startIndex, stopIndex):
+        if startIndex >= stopIndex:
+            return None
+        middleIndex = (startIndex + stopIndex) // 2
+        for childIndex in [self.BuildMaxStops(startIndex, middleIndex), self.BuildMaxStops(middleIndex + 1, stopIndex)]:
+            if childIndex is not None and self.maxStops[childIndex] > self.maxStops[middleIndex]:
+                self.maxStops[middleIndex] = self.maxStops[childIndex]
+        return middleIndex
+
+    # Gets the entries that overlap a frame range (including clips that only touch it), in start frame order.
+    def GetOverlapping(self, startFrame, stopFrame):
+        overlapping = []
+        stack = [[0, len(self.entries)]]
+        while stack:
+            rangeStart, rangeStop = stack.pop()
+            if rangeStart >= rangeStop:
+                continue
+            middleIndex = (rangeStart + rangeStop) // 2
+            if self.maxStops[middleIndex] < startFrame:
+                continue
+            if self.starts[middleIndex] <= stopFrame:
+                stack.append([middleIndex + 1, rangeStop])
+                if self.entries[middleIndex][3] >= startFrame:
+                    overlapping.append(middleIndex)
+            stack.append([rangeStart, middleIndex])
+        return [self.entries[entryIndex] for entryIndex in sorted(overlapping)]
+
+class StorySnapshot(object):
+    def __init__(self):
+        self.callbacksRegistered = False
+        self.Clear()
+
+    # Empties the snapshot, so that it's read again the next time it's used.
+    def Clear(self):
+        self.dirty = True
+        self.entries = []
+        self.characterEntries = {}
+        self.characterTrees = {}
+        self.characterSignatures = {}
+
+    # Registers the scene change and file callbacks that mark the snapshot as out of date.
+    def RegisterCallbacks(self):
+        try:
+            FBSystem().Scene.OnChange.Add(self.OnSceneChange)
+            FBApplication().OnFileNewCompleted.Add(self.OnFileChange)
+            FBApplication().OnFileOpenCompleted.Add(self.OnFileChange)
+            FBApplication().OnFileExit.Add(self.OnFileExit)
+            self.callbacksRegistered = True
+        except:
+            self.callbacksRegistered = False
+
+    # Removes the callbacks.
+    def UnregisterCallbacks(self):
+        if self.callbacksRegistered:
+            try:
+                FBSystem().Scene.OnChange.Remove(self.OnSceneChange)
+                FBApplication().OnFileNewCompleted.Remove(self.OnFileChange)
+                FBApplication().OnFileOpenCompleted.Remove(self.OnFileChange)
+                FBApplication().OnFileExit.Remove(self.OnFileExit)
+            except:
+                pass
+            self.callbacksRegistered = False
+        self.Clear()
+
+    # Scene change callback. Selection changes are ignored, because the selection is always read from the clips.
+    def OnSceneChange(self, control, event):
+        if event.Type in [FBSceneChangeType.kFBSceneChangeSelect, FBSceneChangeType.kFBSceneChangeUnselect]:
+            return
+        if isinstance(event.Component, (FBStoryClip, FBStoryTrack, FBStoryFolder)) or isinstance(event.ChildComponent, (FBStoryClip, FBStoryTrack, FBStoryFolder)):
+            self.dirty = True
+
+    # File new/open callback.
+    def OnFileChange(self, control, event):
+        self.Clear()
+
+    # File exit callback.
+    def OnFileExit(self, control, event):
+        self.UnregisterCallbacks()
+
+    # Reads the Story again, rebuilding the interval trees for characters whose clips have changed.
+    def Refresh(self):
+        self.entries = []
+        characterEntries = {}
+        for track in IterStoryTracks():
+            characterKey = GetStoryTrackCharacterKey(track)
+            for clip in track.Clips:
+                entry = [track, clip, clip.Start.GetFrame(), clip.Stop.GetFrame()]
+                self.entries.append(entry)
+                characterEntries.setdefault(characterKey, []).append(entry)
+        characterTrees = {}
+        characterSignatures = {}
+        for characterKey, entries in characterEntries.items():
+            signature = [[entry[1].Name, entry[2], entry[3]] for entry in entries]
+            if characterKey in self.characterTrees and self.characterSignatures.get(characterKey) == signature:
+                characterTrees[characterKey] = self.characterTrees[characterKey]
+                characterTrees[characterKey].entries = sorted(entries, key = lambda entry: entry[2])
+            else:
+                characterTrees[characterKey] = StoryClipIntervalTree(entries)
+            characterSignatures[characterKey] = signature
+        self.characterEntries = characterEntries
+        self.characterTrees = characterTrees
+        self.characterSignatures = characterSignatures
+        self.dirty = False
+
+    # Refreshes the snapshot if it's out of date.
+    def Update(self):
+        if not self.callbacksRegistered:
+            self.RegisterCallbacks()
+        if self.dirty or not self.callbacksRegistered:
+            self.Refresh()
+
+    # Checks that clip entries still have the clips' start and stop frames.
+    def AreClipTimesCurrent(self, entries):
+        for entry in entries:
+            if entry[1].Start.GetFrame() != entry[2] or entry[1].Stop.GetFrame() != entry[3]:
+                return False
+        return True
+
+    # Gets the interval trees for a character, or every character if no character is given.
+    def GetTrees(self, character = None):
+        self.Update()
+        if character is None:
+            return list(self.characterTrees.values())
+        characterKey = character if isinstance(character, str) else character.LongName
+        return [self.characterTrees[characterKey]] if characterKey in self.characterTrees else []
+
+    # Gets the clip entries that overlap a frame range from the interval trees, for a character or every character.
+    def QueryTrees(self, startFrame, stopFrame, character = None):
+        entries = []
+        for tree in self.GetTrees(character):
+            entries.extend(tree.GetOverlapping(startFrame, stopFrame))
+        return entries
+
+    # Gets the clip entries that overlap a frame range, for a character or every character. If any of the clips found have been retimed since the snapshot was read, the snapshot is refreshed and the query is run again.
+    def GetOverlappingEntries(self, startFrame, stopFrame, character = None, selectedOnly = False):
+        entries = self.QueryTrees(startFrame, stopFrame, character)
+        if not self.AreClipTimesCurrent(entries):
+            self.Refresh()
+            entries = self.QueryTrees(startFrame, stopFrame, character)
+        if selectedOnly:
+            entries = [entry for entry in entries if entry[1].Selected]
+        return entries
+
+    # Gets the clips that overlap a frame range, for a character or every character.
+    def GetOverlappingClips(self, startFrame, stopFrame, character = None, selectedOnly = False, includeTrack = False):
+        return [[entry[0], entry[1]] if includeTrack else entry[1] for entry in self.GetOverlappingEntries(startFrame, stopFrame, character, selectedOnly)]
+
+    # Gets the clips that are playing at a frame, for a character or every character.
+    def GetClipsAtFrame(self, frame, character = None, selectedOnly = False, includeTrack = False):
+        return self.GetOverlappingClips(frame, frame, character, selectedOnly, includeTrack)
+
+    # Gets the selected clips, in Story track order. The selection is read from the clips, rather than kept in the snapshot.
+    def GetSelectedClips(self, includeTrack = False):
+        self.Update()
+        return [[entry[0], entry[1]] if includeTrack else entry[1] for entry in self.entries if entry[1].Selected]
+
+storySnapshot = StorySnapshot()
+
+# Gets the Story snapshot.
+def GetStorySnapshot():
+    return storySnapshot
+
+# Gets the selected Story clips from the Story Editor, including clips on tracks in sub-folders.
 def GetSelectedStoryClips(includeTrack = False):
-    clipsList = []
-    tracks = FBStory().RootFolder.Tracks
-    for track in tracks:
-        trackCharacter = track.Character
-        for clip in track.Clips:
-            if clip.Selected:
-                if includeTrack:
-                    clipsList.append([track, clip])
-                else:
-                    clipsList.append(clip)
-    return clipsList
+    return GetStorySnapshot().GetSelectedClips(includeTrack)
 
 # Copies a Story Clip to a new Story Track.
 def CopyClipToNewTrack(clipInfo):
@@ -73,26 +263,177 @@ def CenterSelectedClips():
 
 # Copies selected Story Clips to takes. Centers clips by default. To note: I mute the Story Editor at the end because it seemed natural to check the newly plotted takes without the Story Editor overriding.
 def CopySelectedStoryClipsToTakes(centerClips = True):
-    clipsList = GetSelectedStoryClips(True)
-    trackMuteStatus = []
-    for track in FBStory().RootFolder.Tracks:
-        trackMuteStatus.append([track, track.Mute])
-        track.Mute = True
-    for clipInfo in clipsList:
-        newTrack, newClip = CopyClipToNewTrack(clipInfo)
+    return ExtractStoryClipsToTakes(centerClips)
+
+'''
+The following functions are for extracting Story clips to takes in batches, with a checkpoint so that an extraction that gets interrupted (or has takes that fail) can be picked up where it stopped.
+
+The Story is read once up front to plan every take: which clip on which track it comes from, the take name and the character. That plan is saved as a json checkpoint file, next to the scene file (or in the Documents\MB folder if the scene hasn't been saved). Takes are then created a batch at a time (the first is created empty, and the rest are copies of it, so the current take's animation is only copied once), and each take in the batch is plotted. The checkpoint is saved after every take, and deleted once every take is done.
+
+Each take in the plan is a dictionary of trackIndex, clipIndex, clipName, takeName, character, takeCreated and status, where status is "Pending", "Done" or "Failed". Planned take names are made unique against the takes already in the scene, so existing takes are never plotted over. takeCreated is set once the extraction has made the take, and only those takes are reused when resuming.
+'''
+
+# Gets the default checkpoint file path for the current scene.
+def GetStoryExtractionCheckpointPath():
+    sceneFilePath = FBApplication().FBXFileName
+    if sceneFilePath:
+        return os.path.splitext(sceneFilePath)[0] + "_StoryExtraction.json"
+    return os.path.join(GetMBDirectory(), "StoryExtraction.json")
+
+# Saves an extraction plan to a checkpoint file.
+def SaveStoryExtractionCheckpoint(checkpointPath, plan):
+    folderPath = os.path.dirname(checkpointPath)
+    if folderPath and not os.path.exists(folderPath):
+        os.makedirs(folderPath)
+    tempPath = checkpointPath + ".tmp"
+    with open(tempPath, "w") as checkpointFile:
+        json.dump(plan, checkpointFile, indent = 1)
+    if hasattr(os, "replace"):
+        os.replace(tempPath, checkpointPath)
+    else:
+        if os.path.exists(checkpointPath):
+            os.remove(checkpointPath)
+        os.rename(tempPath, checkpointPath)
+
+# Loads an extraction plan from a checkpoint file, or returns None if there isn't one.
+def LoadStoryExtractionCheckpoint(checkpointPath):
+    if os.path.isfile(checkpointPath):
+        with open(checkpointPath, "r") as checkpointFile:
+            return json.load(checkpointFile)
+
+# Gets a take name that isn't in usedNames, by adding a number to the end if needed, and adds it to usedNames.
+def GetUniqueTakeName(takeName, usedNames):
+    uniqueName = takeName
+    count = 1
+    while uniqueName in usedNames:
+        count += 1
+        uniqueName = "%s_%s" % (takeName, count)
+    usedNames.add(uniqueName)
+    return uniqueName
+
+# Plans the takes for the selected Story clips, reading the Story once. Take names are made unique against the scene's takes and each other.
+def PlanStoryClipExtraction(centerClips = True):
+    plan = {"centerClips": centerClips, "takes": []}
+    usedNames = set([take.Name for take in FBSystem().Scene.Takes])
+    for trackIndex, track in enumerate(IterStoryTracks()):
+        character = track.Character
+        for clipIndex, clip in enumerate(track.Clips):
+            if clip.Selected:
+                takeName = GetUniqueTakeName(clip.Name, usedNames)
+                plan["takes"].append({"trackIndex": trackIndex, "clipIndex": clipIndex, "clipName": clip.Name, "takeName": takeName, "character": character.LongName if character else None, "takeCreated": False, "status": "Pending"})
+    return plan
+
+# Gets the Story track and clip for a planned take. Raises an error if the Story has changed so that the clip isn't where it was planned.
+def GetPlannedClipInfo(plannedTake):
+    tracks = list(IterStoryTracks())
+    if plannedTake["trackIndex"] < len(tracks):
+        track = tracks[plannedTake["trackIndex"]]
+        if plannedTake["clipIndex"] < len(track.Clips):
+            clip = track.Clips[plannedTake["clipIndex"]]
+            if clip.Name == plannedTake["clipName"]:
+                return [track, clip]
+    raise ValueError("Story clip %s isn't where it was when the extraction was planned." % (plannedTake["clipName"]))
+
+# Creates the takes for a list of planned takes. A take is only reused if this extraction created it (e.g. before it was interrupted). Any other take with the planned name is left alone, and the new take gets a unique name instead. Returns the takes, in the same order as plannedTakes.
+def CreatePlannedTakes(plannedTakes):
+    existingTakes = dict([[take.Name, take] for take in FBSystem().Scene.Takes])
+    usedNames = set(existingTakes)
+    emptyTake = None
+    takes = []
+    for plannedTake in plannedTakes:
+        take = existingTakes.get(plannedTake["takeName"]) if plannedTake.get("takeCreated") else None
+        if not take:
+            takeName = GetUniqueTakeName(plannedTake["takeName"], usedNames)
+            if emptyTake:
+                take = emptyTake.CopyTake(takeName)
+            else:
+                take = CreateNewTake(takeName)
+                emptyTake = take
+            plannedTake["takeName"] = takeName
+            plannedTake["takeCreated"] = True
+            existingTakes[takeName] = take
+        takes.append(take)
+    return takes
+
+# Copies a planned clip to the current take: copies the clip to a new track, sets the take's time span to the clip, plots the character, then deletes the track.
+def ExtractPlannedClip(plannedTake, take, centerClips = True):
+    newTrack, newClip = CopyClipToNewTrack(GetPlannedClipInfo(plannedTake))
+    try:
         if centerClips:
             newClip.Translation = FBVector3d(0,0,0)
             newClip.Rotation = FBVector3d(0,-90,0)
-        newTake = CreateNewTake(newClip.Name)
-        FBSystem().CurrentTake = newTake
-        span = newTake.LocalTimeSpan
+        span = take.LocalTimeSpan
         span.Set(newClip.Start, newClip.Stop)
-        newTake.LocalTimeSpan = span
+        take.LocalTimeSpan = span
         character = newTrack.Character
         if not character:
             character = FBApplication().CurrentCharacter
         PlotToCharacter(character)
+    finally:
         newTrack.FBDelete()
-    for trackInfo in trackMuteStatus:
-        trackInfo[0].Mute = trackInfo[1]
-    FBStory().Mute = True
+
+# Extracts the selected Story clips to takes, batchSize takes at a time. If resume is True and there's a checkpoint, the takes in it that aren't done are extracted instead of the selected clips. Returns the take batch report for the takes that were extracted.
+def ExtractStoryClipsToTakes(centerClips = True, resume = False, checkpointPath = None, batchSize = 25, showProgress = True, progressCallback = None, cancelCallback = None):
+    if not checkpointPath:
+        checkpointPath = GetStoryExtractionCheckpointPath()
+    plan = None
+    if resume:
+        plan = LoadStoryExtractionCheckpoint(checkpointPath)
+        if not plan:
+            print("No Story extraction checkpoint found at %s" % (checkpointPath))
+            return []
+    else:
+        plan = PlanStoryClipExtraction(centerClips)
+    plannedTakes = [plannedTake for plannedTake in plan["takes"] if plannedTake["status"] != "Done"]
+    if not plannedTakes:
+        return []
+    SaveStoryExtractionCheckpoint(checkpointPath, plan)
+    progress = None
+    if showProgress and not progressCallback and not cancelCallback:
+        progress = TakeBatchProgress("Copying Story clips to takes")
+        progressCallback = progress.Progress
+        cancelCallback = progress.Cancel
+    trackMuteStatus = []
+    for track in IterStoryTracks():
+        trackMuteStatus.append([track, track.Mute])
+        track.Mute = True
+    report = []
+    try:
+        for batchStart in range(0, len(plannedTakes), max(1, batchSize)):
+            if cancelCallback and cancelCallback():
+                break
+            batch = plannedTakes[batchStart:batchStart + max(1, batchSize)]
+            takes = CreatePlannedTakes(batch)
+            SaveStoryExtractionCheckpoint(checkpointPath, plan)
+            plannedTakesByTake = list(zip(takes, batch))
+
+            def ExtractTake(take):
+                plannedTake = [plannedTake for batchTake, plannedTake in plannedTakesByTake if batchTake == take][0]
+                plannedTake["status"] = "Failed"
+                ExtractPlannedClip(plannedTake, take, plan["centerClips"])
+                plannedTake["status"] = "Done"
+                SaveStoryExtractionCheckpoint(checkpointPath, plan)
+
+            def BatchProgress(take, takesDone, takeCount, status):
+                if progressCallback:
+                    progressCallback(take, batchStart + takesDone, len(plannedTakes), status)
+
+            batchReport = RunForTakes(takes, ExtractTake, BatchProgress, cancelCallback)
+            SaveStoryExtractionCheckpoint(checkpointPath, plan)
+            report.extend(batchReport)
+    finally:
+        for trackInfo in trackMuteStatus:
+            trackInfo[0].Mute = trackInfo[1]
+        FBStory().Mute = True
+        if progress:
+            progress.Close()
+    if all([plannedTake["status"] == "Done" for plannedTake in plan["takes"]]):
+        os.remove(checkpointPath)
+    else:
+        print("Story extraction checkpoint saved to %s. Use Resume Story Clips To Takes to carry on." % (checkpointPath))
+    PrintTakeBatchReport(report)
+    return report
+
+# Carries on a Story clip extraction from its checkpoint.
+def ResumeStoryClipsToTakes():
+    return ExtractStoryClipsToTakes(resume = True)